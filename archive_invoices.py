@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Move invoices older than a cutoff out of the hot invoices collection
+
+    python archive_invoices.py --before 2024-04-01
+    python archive_invoices.py --older-than-days 730 --target jsonl --archive-dir /backups/invoices
+
+Invoices are copied in batches (oldest invoice_date first, one company at
+a time so each batch stays on the company_id-prefixed date index) to the
+invoices_archive collection or to gzipped JSONL files, then deleted from
+invoices. Progress is checkpointed in maintenance_checkpoints, so a crashed
+run can simply be started again: a batch that was copied but not deleted is
+finished first, and re-copying a batch overwrites rather than duplicates it.
+
+Rollups are left alone, so reports still include archived invoices, and
+rebuild_rollups.py reads invoices_archive as well as invoices. Invoices
+archived with --target jsonl are gone from the database, so a rollup
+rebuild permanently drops them from reports.
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from bson import json_util
+from pymongo import MongoClient, DeleteOne, ReplaceOne
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv('/app/backend/.env')
+
+CHECKPOINT_ID = "archive_invoices"
+ARCHIVE_COLLECTION = "invoices_archive"
+
+def write_jsonl_batch(archive_dir, cutoff, batch_number, batch):
+    """Atomically write one batch as gzipped extended-JSON lines"""
+    path = Path(archive_dir) / f"invoices-before-{cutoff:%Y%m%d}-{batch_number:06d}.jsonl.gz"
+    tmp_path = path.with_name(path.name + ".tmp")
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as fh:
+        for doc in batch:
+            fh.write(json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS))
+            fh.write("\n")
+    # Same name on a rerun of the same batch, so a retry replaces the file
+    os.replace(tmp_path, path)
+    return str(path)
+
+def delete_archived(db, pending):
+    """Delete a copied batch, skipping invoices edited since they were copied"""
+    operations = [DeleteOne({"_id": doc_id, "version": version}) for doc_id, version in pending["docs"]]
+    if not operations:
+        return 0
+    return db.invoices.bulk_write(operations, ordered=False).deleted_count
+
+def archive_invoices(cutoff, target, archive_dir, batch_size, max_per_second):
+    """Copy invoices dated before the cutoff to the archive, then delete them, in batches"""
+    try:
+        mongo_url = os.environ['MONGO_URL']
+        db_name = os.environ['DB_NAME']
+
+        client = MongoClient(mongo_url, tz_aware=True)
+        db = client[db_name]
+        checkpoints = db.maintenance_checkpoints
+
+        print(f"🗄️  Archiving invoices dated before {cutoff:%Y-%m-%d} to {target}...")
+        if target == "jsonl":
+            Path(archive_dir).mkdir(parents=True, exist_ok=True)
+
+        checkpoint = checkpoints.find_one({"_id": CHECKPOINT_ID}) or {}
+        if checkpoint.get("pending"):
+            deleted = delete_archived(db, checkpoint["pending"])
+            checkpoints.update_one(
+                {"_id": CHECKPOINT_ID}, {"$unset": {"pending": ""}, "$inc": {"archived": deleted}}
+            )
+            print(f"↩️  Finished interrupted batch: deleted {deleted} already-archived invoices")
+            checkpoint = checkpoints.find_one({"_id": CHECKPOINT_ID})
+
+        if checkpoint.get("cutoff") != cutoff or checkpoint.get("target") != target:
+            checkpoint = {"_id": CHECKPOINT_ID, "cutoff": cutoff, "target": target, "batches": 0, "archived": 0}
+            checkpoints.replace_one({"_id": CHECKPOINT_ID}, checkpoint, upsert=True)
+
+        untenanted = db.invoices.count_documents({"company_id": {"$exists": False}})
+        if untenanted:
+            print(f"❌ {untenanted} invoices have no company_id; run migrate.py first")
+            sys.exit(1)
+
+        archived = 0
+        started = time.monotonic()
+        company_ids = db.invoices.distinct("company_id")
+        while company_ids:
+            # Archived invoices leave the collection, so the oldest remaining
+            # ones are always the next batch; no cursor position to track
+            batch = list(
+                db.invoices.find({"company_id": company_ids[0], "invoice_date": {"$lt": cutoff}})
+                .sort("invoice_date", 1).limit(batch_size)
+            )
+            if not batch:
+                company_ids.pop(0)
+                continue
+
+            batch_number = checkpoint["batches"] + 1
+            location = ARCHIVE_COLLECTION
+            if target == "jsonl":
+                location = write_jsonl_batch(archive_dir, cutoff, batch_number, batch)
+            else:
+                db[ARCHIVE_COLLECTION].bulk_write(
+                    [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch], ordered=False
+                )
+
+            # Record the copy before deleting, so a crash in between resumes here
+            pending = {"docs": [[doc["_id"], doc.get("version")] for doc in batch], "location": location}
+            checkpoints.update_one({"_id": CHECKPOINT_ID}, {"$set": {"pending": pending}})
+            deleted = delete_archived(db, pending)
+            checkpoints.update_one(
+                {"_id": CHECKPOINT_ID},
+                {
+                    "$unset": {"pending": ""},
+                    "$inc": {"batches": 1, "archived": deleted},
+                    "$set": {"updated_at": datetime.now(timezone.utc)},
+                }
+            )
+            checkpoint["batches"] = batch_number
+            archived += deleted
+
+            elapsed = time.monotonic() - started
+            skipped = len(batch) - deleted
+            note = f", {skipped} edited mid-batch will be retried" if skipped else ""
+            print(f"   ...batch {batch_number}: {archived} invoices archived ({elapsed:.1f}s){note}")
+
+            # Throttle to max_per_second so the primary keeps up with live traffic
+            if max_per_second:
+                ahead = (archived + skipped) / max_per_second - elapsed
+                if ahead > 0:
+                    time.sleep(ahead)
+
+        client.close()
+        print(f"✅ Archived {archived} invoices dated before {cutoff:%Y-%m-%d}")
+
+    except Exception as e:
+        print(f"❌ Error archiving invoices: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive invoices older than a cutoff")
+    cutoff_group = parser.add_mutually_exclusive_group(required=True)
+    cutoff_group.add_argument("--before", type=datetime.fromisoformat, help="archive invoices dated before this day (YYYY-MM-DD)")
+    cutoff_group.add_argument("--older-than-days", type=int, help="archive invoices older than this many days")
+    parser.add_argument("--target", choices=["collection", "jsonl"], default="collection",
+                        help=f"copy into the {ARCHIVE_COLLECTION} collection or into gzipped JSONL files "
+                             "(jsonl-archived invoices drop out of reports after rebuild_rollups.py)")
+    parser.add_argument("--archive-dir", default=os.environ.get('ARCHIVE_DIR', 'invoice_archive'),
+                        help="directory for --target jsonl")
+    parser.add_argument("--batch-size", type=int, default=int(os.environ.get('ARCHIVE_BATCH_SIZE', 500)))
+    parser.add_argument("--max-per-second", type=float, default=float(os.environ.get('ARCHIVE_MAX_PER_SECOND', 2000)),
+                        help="upper bound on invoices processed per second (0 = unthrottled)")
+    args = parser.parse_args()
+
+    if args.before is not None:
+        cutoff = args.before.replace(tzinfo=args.before.tzinfo or timezone.utc)
+    else:
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        cutoff = today - timedelta(days=args.older_than_days)
+    archive_invoices(cutoff, args.target, args.archive_dir, args.batch_size, args.max_per_second)
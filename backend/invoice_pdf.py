@@ -0,0 +1,263 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+# Dates print in the zone invoices are numbered and billed in (see server.py)
+INVOICE_TZ = ZoneInfo(os.environ.get('FINANCIAL_YEAR_TZ', "Asia/Kolkata"))
+# Bump when the rendered layout changes so stale cached PDFs are not served
+RENDER_VERSION = 2
+
+def company_version(company):
+    """Stable digest of the company record, used to key cached renders"""
+    if not company:
+        return "none"
+    payload = json.dumps(company, sort_keys=True, default=str).encode()
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+def format_date(value):
+    """Format a stored ISO string or datetime as DD/MM/YYYY in the invoicing time zone"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return value
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(INVOICE_TZ).strftime("%d/%m/%Y")
+    return ""
+
+def money(amount):
+    # Base-14 PDF fonts have no rupee glyph
+    return f"Rs. {amount:,.2f}"
+
+def render_invoice_pdf(invoice, company):
+    """Render an invoice document and company details to PDF bytes
+
+    Runs in a worker process, so it only takes and returns plain data.
+    """
+    styles = getSampleStyleSheet()
+    normal = styles['Normal']
+    small = styles['BodyText'].clone('Small', fontSize=8, leading=10)
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4,
+        leftMargin=15 * mm, rightMargin=15 * mm, topMargin=15 * mm, bottomMargin=15 * mm,
+        title=f"Invoice {invoice['invoice_number']}"
+    )
+    story = []
+
+    # Company Header
+    if company:
+        story.append(Paragraph(escape(company['company_name']), styles['Title']))
+        header_lines = [company['address_line1']]
+        if company.get('address_line2'):
+            header_lines.append(company['address_line2'])
+        header_lines.append(f"{company['city']}, {company['state']}, {company['zip_code']}")
+        header_lines.append(company.get('country') or '')
+        header_lines.append(f"Phone: {company['phone']} | Email: {company['email']}")
+        if company.get('website'):
+            header_lines.append(f"Website: {company['website']}")
+        header_lines.append(f"GSTIN: {company['gstin']}")
+        story.append(Paragraph("<br/>".join(escape(line) for line in header_lines), normal))
+        story.append(Spacer(1, 6 * mm))
+
+    # Invoice Title & Details
+    story.append(Paragraph("TAX INVOICE", styles['Heading1']))
+    details = [
+        f"<b>Invoice#:</b> {escape(invoice['invoice_number'])}",
+        f"<b>Invoice Date:</b> {format_date(invoice.get('invoice_date'))}",
+        f"<b>Terms:</b> {escape(invoice.get('payment_terms') or '')}",
+        f"<b>Due Date:</b> {format_date(invoice.get('due_date'))}",
+    ]
+    if invoice.get('po_number'):
+        details.append(f"<b>P.O.#:</b> {escape(invoice['po_number'])}")
+    details.append(f"<b>Place of Supply:</b> {escape(invoice['place_of_supply'])}")
+    story.append(Paragraph("<br/>".join(details), normal))
+    story.append(Spacer(1, 4 * mm))
+
+    # Bill To
+    customer = invoice['customer']
+    story.append(Paragraph("Bill To", styles['Heading3']))
+    bill_to = [customer['address_line1']]
+    if customer.get('address_line2'):
+        bill_to.append(customer['address_line2'])
+    bill_to.append(f"{customer['city']}, {customer['state']}, {customer['zip_code']}")
+    bill_to.append(customer.get('country') or '')
+    if customer.get('gstin'):
+        bill_to.append(f"GSTIN: {customer['gstin']}")
+    bill_to = [f"<b>{escape(customer['name'])}</b>"] + [escape(line) for line in bill_to]
+    story.append(Paragraph("<br/>".join(bill_to), normal))
+    story.append(Spacer(1, 4 * mm))
+
+    # Line Items Table
+    service = invoice['service_charges']
+    rows = [["#", "Item & Description", "HSN/SAC", "Qty", "Rate", "Amount"]]
+    for index, item in enumerate(invoice['line_items'], start=1):
+        rows.append([
+            index, Paragraph(escape(item['description']), small), item['hsn_sac'],
+            item['quantity'], money(item['rate']), money(item['amount'])
+        ])
+    rows.append([
+        len(invoice['line_items']) + 1, Paragraph(escape(service['description']), small),
+        service['hsn_sac'], 1, money(service['amount']), money(service['amount'])
+    ])
+    items_table = Table(rows, colWidths=[10 * mm, 70 * mm, 22 * mm, 12 * mm, 32 * mm, 34 * mm], repeatRows=1)
+    items_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#374151")),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor("#d1d5db")),
+        ('ALIGN', (3, 1), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ]))
+    story.append(items_table)
+    story.append(Spacer(1, 4 * mm))
+
+    # Totals Section
+    totals = invoice['totals']
+    totals_table = Table([
+        ["Sub Total", money(totals['subtotal'])],
+        [f"CGST ({service['cgst_rate']}%)", money(totals['total_cgst'])],
+        [f"SGST ({service['sgst_rate']}%)", money(totals['total_sgst'])],
+        ["Total", money(totals['grand_total'])],
+        ["Balance Due", money(totals['grand_total'])],
+    ], colWidths=[40 * mm, 40 * mm], hAlign='RIGHT')
+    totals_table.setStyle(TableStyle([
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 3), (-1, -1), 'Helvetica-Bold'),
+        ('LINEABOVE', (0, 3), (-1, 3), 0.5, colors.black),
+    ]))
+    story.append(totals_table)
+    story.append(Paragraph(f"<b>Total In Words:</b> {escape(totals['amount_in_words'])}", normal))
+    story.append(Spacer(1, 4 * mm))
+
+    # Bank Details
+    if company:
+        bank = [
+            company['company_name'],
+            f"A/C No.: {company['account_number']}",
+            f"IFSC Code: {company['ifsc_code']}",
+            f"Bank Name: {company['bank_name']}",
+            f"Branch: {company['branch']}",
+        ]
+        if company.get('branch_code'):
+            bank.append(f"Branch Code: {company['branch_code']}")
+        story.append(Paragraph("Company Bank Details:", styles['Heading4']))
+        story.append(Paragraph("<br/>".join(escape(line) for line in bank), normal))
+
+    # Terms & Conditions and Notes
+    story.append(Paragraph("Terms &amp; Conditions", styles['Heading4']))
+    story.append(Paragraph(escape(invoice.get('terms_conditions') or ""), small))
+    story.append(Paragraph("Note:", styles['Heading4']))
+    story.append(Paragraph(escape(invoice.get('notes') or ""), small))
+    story.append(Paragraph("Thanks for your business.", small))
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+class PdfCache:
+    """Bounded on-disk cache of rendered PDFs with LRU eviction
+
+    Every uvicorn worker shares the directory but keeps its own index. A miss
+    in the index falls back to the disk, so a PDF rendered by one worker is
+    served by all, and each worker re-reads the directory at most every
+    resync_seconds before evicting, so max_bytes bounds the directory as a
+    whole rather than each worker's own writes.
+    """
+
+    def __init__(self, directory, max_bytes, resync_seconds=60):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.resync_seconds = resync_seconds
+        self._lock = threading.Lock()
+        # filename -> size in bytes, least recently used first
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._synced_at = 0.0
+
+        with self._lock:
+            self._resync()
+            self._evict()
+
+    @staticmethod
+    def key(invoice_id, updated_at, company_version):
+        if isinstance(updated_at, datetime):
+            updated_at = updated_at.isoformat()
+        raw = f"{invoice_id}:{updated_at}:{company_version}:{RENDER_VERSION}".encode()
+        return hashlib.sha256(raw).hexdigest()
+
+    def get(self, key):
+        filename = f"{key}.pdf"
+        path = self.directory / filename
+        try:
+            data = path.read_bytes()
+            # Keep mtime as the recency marker so order survives restarts
+            # and is shared with the other workers
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._total_bytes -= self._entries.pop(filename, 0)
+            return None
+        with self._lock:
+            # Possibly written by another worker; adopt it into our index
+            self._total_bytes -= self._entries.pop(filename, 0)
+            self._entries[filename] = len(data)
+            self._total_bytes += len(data)
+        return data
+
+    def put(self, key, data):
+        filename = f"{key}.pdf"
+        path = self.directory / filename
+        # Unique per worker process and thread; readers only ever see whole files
+        tmp_path = self.directory / f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._total_bytes -= self._entries.pop(filename, 0)
+            self._entries[filename] = len(data)
+            self._total_bytes += len(data)
+            if time.monotonic() - self._synced_at >= self.resync_seconds:
+                self._resync()
+            self._evict()
+
+    def _resync(self):
+        # Caller holds the lock; rebuild the index from what every worker wrote
+        entries = []
+        for path in self.directory.glob("*.pdf"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, path.name, stat.st_size))
+        entries.sort()
+        self._entries = OrderedDict((name, size) for _, name, size in entries)
+        self._total_bytes = sum(size for _, _, size in entries)
+        self._synced_at = time.monotonic()
+
+    def _evict(self):
+        # Caller holds the lock (or is __init__)
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            filename, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                (self.directory / filename).unlink()
+            except FileNotFoundError:
+                pass
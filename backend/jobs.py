@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+
+class JobContext:
+    """Handle passed to a running job for progress reporting"""
+
+    def __init__(self, queue, job):
+        self.queue = queue
+        self.id = job['id']
+        # None for jobs queued before submit() recorded a company
+        self.company_id = job.get('company_id')
+        self.progress_state = job.get('progress')
+        self._reported_at = 0.0
+
+    async def progress(self, done, total=None):
+        """Record progress; writes are coalesced to one per progress_interval"""
+        self.progress_state = {"done": done, "total": total}
+        if time.monotonic() - self._reported_at >= self.queue.progress_interval:
+            self._reported_at = time.monotonic()
+            await self.queue._update(self.id, {"progress": self.progress_state})
+
+
+class JobQueue:
+    """Mongo-backed job queue drained by a bounded pool of asyncio workers
+
+    Jobs are claimed with a renewable lease, so a job whose process died is
+    picked up again once the lease lapses, by this process after a restart or
+    by any other uvicorn worker sharing the database.
+    """
+
+    def __init__(self, workers, lease_seconds=60, poll_seconds=2.0, max_attempts=3, progress_interval=1.0):
+        self.workers = workers
+        self.lease = timedelta(seconds=lease_seconds)
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.progress_interval = progress_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.collection = None
+        # job type -> (params model, async handler(params, job) -> result)
+        self._handlers = {}
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+
+    def handler(self, job_type, params_model):
+        """Register an async handler taking (params, JobContext) and returning a JSON-able result"""
+        def register(func):
+            self._handlers[job_type] = (params_model, func)
+            return func
+        return register
+
+    async def submit(self, job_type, params, company_id):
+        """Validate and enqueue a job for a company; raises ValueError for unknown types or bad params"""
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type: {job_type}. Expected one of {sorted(self._handlers)}")
+        params_model, _ = self._handlers[job_type]
+        params = params_model(**params)
+
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid.uuid4()),
+            "company_id": company_id,
+            "type": job_type,
+            "params": params.dict(),
+            "status": "queued",
+            "progress": None,
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.collection.insert_one(job)
+        job.pop('_id', None)
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id, company_id):
+        return await self.collection.find_one(
+            {"id": job_id, "company_id": company_id}, {"_id": 0, "owner": 0, "lease_expires_at": 0}
+        )
+
+    def start(self, collection):
+        self.collection = collection
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _update(self, job_id, fields):
+        # Scoped to our lease so a worker that lost its job can't overwrite it
+        fields = {**fields, "updated_at": datetime.now(timezone.utc)}
+        await self.collection.update_one({"id": job_id, "owner": self.owner}, {"$set": fields})
+
+    async def _claim(self):
+        now = datetime.now(timezone.utc)
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued"},
+                {"status": "running", "lease_expires_at": {"$lt": now}},
+            ]},
+            {
+                "$set": {"status": "running", "owner": self.owner, "lease_expires_at": now + self.lease,
+                         "started_at": now, "updated_at": now},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _heartbeat(self, job_id):
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            await self._update(job_id, {"lease_expires_at": datetime.now(timezone.utc) + self.lease})
+
+    async def _worker(self):
+        while True:
+            try:
+                self._wakeup.clear()
+                job = await self._claim()
+                if job is None:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # e.g. MongoDB briefly unreachable; back off and keep draining
+                logger.exception("Job worker error")
+                await asyncio.sleep(self.poll_seconds)
+
+    async def _run(self, job):
+        job_id = job['id']
+        if job['attempts'] > self.max_attempts:
+            await self._update(job_id, {
+                "status": "failed", "error": f"Abandoned after {self.max_attempts} attempts",
+                "finished_at": datetime.now(timezone.utc),
+            })
+            return
+        if job['type'] not in self._handlers:
+            await self._update(job_id, {"status": "failed", "error": f"Unknown job type: {job['type']}",
+                                        "finished_at": datetime.now(timezone.utc)})
+            return
+
+        params_model, handler = self._handlers[job['type']]
+        context = JobContext(self, job)
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        started = time.monotonic()
+        try:
+            result = await handler(params_model(**job['params']), context)
+            await self._update(job_id, {
+                "status": "succeeded", "result": result, "progress": context.progress_state,
+                "finished_at": datetime.now(timezone.utc),
+            })
+            logger.info("Job %s (%s) succeeded in %.1fs", job_id, job['type'], time.monotonic() - started)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job straight back instead of waiting out the lease
+            await asyncio.shield(self.collection.update_one(
+                {"id": job_id, "owner": self.owner},
+                {"$set": {"status": "queued", "owner": None, "progress": context.progress_state},
+                 "$inc": {"attempts": -1}}
+            ))
+            raise
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job_id, job['type'])
+            await self._update(job_id, {
+                "status": "failed", "error": str(e), "progress": context.progress_state,
+                "finished_at": datetime.now(timezone.utc),
+            })
+        finally:
+            heartbeat.cancel()
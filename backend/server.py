@@ -1,32 +1,402 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Query
 from dotenv import load_dotenv
+from fastapi.responses import Response, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
+from brotli_asgi import BrotliMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pymongo import ASCENDING, DESCENDING, TEXT, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationError
+from pydantic_core import PydanticUndefined
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Literal, Optional, Union, get_args, get_origin
 import uuid
+import asyncio
+import base64
+import csv
+import hashlib
+import io
+import json
+import multiprocessing
+import re
+import time
+import zipfile
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
+from zoneinfo import ZoneInfo
+import numpy as np
+import orjson
+from pymongo import UpdateOne
+from invoice_pdf import PdfCache, company_version, render_invoice_pdf
+from jobs import JobQueue
+from metrics import CommandMetrics, MetricsMiddleware, PoolMetrics, render_metrics
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection, opened by the app lifespan rather than at import time
+client = None
+db = None
+pool_metrics = PoolMetrics()
+# True once the pool is warm and indexes exist; gates /api/health/ready
+mongo_ready = False
+
+# Pool settings passed through to the driver when the variable is set
+MONGO_POOL_OPTIONS = {
+    "maxPoolSize": "MONGO_MAX_POOL_SIZE",
+    "minPoolSize": "MONGO_MIN_POOL_SIZE",
+    "maxIdleTimeMS": "MONGO_MAX_IDLE_TIME_MS",
+    "maxConnecting": "MONGO_MAX_CONNECTING",
+    "waitQueueTimeoutMS": "MONGO_WAIT_QUEUE_TIMEOUT_MS",
+    "connectTimeoutMS": "MONGO_CONNECT_TIMEOUT_MS",
+    "serverSelectionTimeoutMS": "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+    "socketTimeoutMS": "MONGO_SOCKET_TIMEOUT_MS",
+}
+
+def mongo_client_options():
+    """Driver keyword arguments built from the MONGO_* environment"""
+    options = {"tz_aware": True, "event_listeners": [CommandMetrics(), pool_metrics]}
+    for option, variable in MONGO_POOL_OPTIONS.items():
+        if os.environ.get(variable):
+            options[option] = int(os.environ[variable])
+    return options
+
+async def connect_mongo():
+    """Open the Motor client and warm its pool before serving traffic"""
+    global client, db
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], **mongo_client_options())
+    db = client[os.environ['DB_NAME']]
+
+    # Concurrent pings each check out a connection, so the first requests
+    # after a deploy don't pay for the TCP/TLS handshakes
+    warm = int(os.environ.get('MONGO_WARMUP_CONNECTIONS', client.options.pool_options.min_pool_size or 1))
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(max(warm, 1))))
+    logger.info("MongoDB pool warmed with %d connections", pool_metrics.open_connections)
+
+# Server-side PDF rendering: CPU-bound work goes to a process pool, results
+# are cached on disk keyed by (invoice id, updated_at, company version)
+pdf_cache = PdfCache(
+    os.environ.get('PDF_CACHE_DIR', str(ROOT_DIR / 'pdf_cache')),
+    int(os.environ.get('PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+)
+pdf_executor = None
+PDF_RENDER_WORKERS = int(os.environ.get('PDF_RENDER_WORKERS', os.cpu_count() or 1))
+
+def get_pdf_executor():
+    """Create the PDF render pool on first use"""
+    global pdf_executor
+    if pdf_executor is None:
+        # spawn: forking a process that already runs Motor's threads is unsafe
+        pdf_executor = ProcessPoolExecutor(
+            max_workers=PDF_RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return pdf_executor
+
+def discard_pdf_executor(executor):
+    """Drop a broken pool so the next render starts a fresh one"""
+    global pdf_executor
+    # Concurrent renders all see the same breakage; only replace it once
+    if pdf_executor is executor:
+        pdf_executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+async def render_pdf_in_pool(invoice, company):
+    """Render in the process pool, retrying once on a new pool if a worker died"""
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        executor = get_pdf_executor()
+        try:
+            return await loop.run_in_executor(executor, render_invoice_pdf, invoice, company)
+        except BrokenProcessPool:
+            # A worker was killed (OOM, segfault); the pool refuses all work from now on
+            logger.warning("PDF render pool broke; starting a new one")
+            discard_pdf_executor(executor)
+            if attempt:
+                raise
+
+async def cached_invoice_pdf(invoice, company):
+    """PDF bytes for a stored invoice, rendered in the process pool on a cache miss"""
+    cache_key = PdfCache.key(invoice['id'], invoice.get('updated_at'), company_version(company))
+    pdf = await asyncio.to_thread(pdf_cache.get, cache_key)
+    if pdf is None:
+        pdf = await render_pdf_in_pool(invoice, company)
+        await asyncio.to_thread(pdf_cache.put, cache_key, pdf)
+    return pdf
+
+def pdf_filename(invoice):
+    """Filesystem- and header-safe PDF name for an invoice, without extension"""
+    return re.sub(r'[^A-Za-z0-9._-]', '_', invoice['invoice_number'])
+
+def zip_entry_name(invoice, taken):
+    """Archive entry name for an invoice's PDF, unique among `taken`, which it joins
+
+    Sanitising can map distinct numbers to one name (INV/1 and INV_1), so a
+    clash falls back to the invoice id.
+    """
+    name = f"{pdf_filename(invoice)}.pdf"
+    if name in taken:
+        name = f"{pdf_filename(invoice)}-{invoice['id']}.pdf"
+    taken.add(name)
+    return name
+
+PDF_ARCHIVE_DIR = Path(os.environ.get('PDF_ARCHIVE_DIR', str(ROOT_DIR / 'pdf_archives')))
+
+class ZipChunks:
+    """Write-only file object that buffers zipfile output for streaming
+
+    zipfile falls back to data descriptors when its file has no tell/seek,
+    so entries can be handed on as soon as they are written.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+# Tenancy: every request acts for one company, named by the X-Company-Id
+# header. Data written before tenancy belongs to DEFAULT_COMPANY_ID, which is
+# also used when a request names no company, so single-company deployments
+# keep working unchanged.
+DEFAULT_COMPANY_ID = os.environ.get('DEFAULT_COMPANY_ID', "default")
+COMPANY_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+class CompanyCache:
+    """Process-local copies of each company's details record, keyed by company_id
+
+    Writes in this process update an entry directly. Other uvicorn workers
+    notice a change once the TTL lapses and a cheap version probe disagrees.
+    The least recently used companies are evicted beyond max_entries.
+    """
+
+    def __init__(self, ttl, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # company_id -> (company record or None, checked_at)
+        self._entries = OrderedDict()
+
+    def set(self, company_id, company):
+        self._entries[company_id] = (company, time.monotonic())
+        self._entries.move_to_end(company_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, company_id):
+        entry = self._entries.get(company_id)
+        if entry is not None:
+            company, checked_at = entry
+            self._entries.move_to_end(company_id)
+            if time.monotonic() - checked_at < self.ttl:
+                return company
+
+            # Only the version travels over the wire when nothing changed
+            head = await db.company_details.find_one({"company_id": company_id}, {"_id": 0, "version": 1})
+            cached_version = company.get('version', 0) if company else None
+            head_version = head.get('version', 0) if head is not None else None
+            if head_version == cached_version:
+                self.set(company_id, company)
+                return company
+
+        company = await db.company_details.find_one({"company_id": company_id}, {"_id": 0})
+        self.set(company_id, company)
+        return company
+
+company_cache = CompanyCache(
+    float(os.environ.get('COMPANY_CACHE_TTL_SECONDS', 5)),
+    int(os.environ.get('COMPANY_CACHE_MAX_ENTRIES', 1024)),
+)
+
+# Heavy work (recalculations, bulk PDF renders) runs here instead of in the request
+job_queue = JobQueue(
+    workers=int(os.environ.get('JOB_WORKERS', 2)),
+    lease_seconds=int(os.environ.get('JOB_LEASE_SECONDS', 60)),
+)
+
+# Indexes backing the hot queries below, created idempotently at startup.
+# Every tenant-facing query filters on company_id first, so those indexes
+# lead with it and one company's reads never scan another's invoices.
+INDEXES = {
+    "invoices": [
+        ([("id", ASCENDING)], {"name": "id_unique", "unique": True}),
+        # Each company numbers its own invoices
+        (
+            [("company_id", ASCENDING), ("invoice_number", ASCENDING)],
+            {"name": "company_invoice_number_unique", "unique": True}
+        ),
+        (
+            [("company_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            {"name": "company_created_at_id_desc"}
+        ),
+        (
+            [("company_id", ASCENDING), ("customer.name", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            {"name": "company_customer_created_at"}
+        ),
+        # Date-filtered lists page on (invoice_date, id); also serves export and recalculation ranges
+        (
+            [("company_id", ASCENDING), ("invoice_date", DESCENDING), ("id", DESCENDING)],
+            {"name": "company_invoice_date_id_desc"}
+        ),
+        ([("company_id", ASCENDING), ("customer.gstin", ASCENDING)], {"name": "company_customer_gstin"}),
+        # One invoice per template and period, however often the scheduler runs
+        (
+            [("recurring_template_id", ASCENDING), ("recurring_period", ASCENDING)],
+            {
+                "name": "recurring_template_period_unique",
+                "unique": True,
+                "partialFilterExpression": {"recurring_template_id": {"$exists": True}},
+            }
+        ),
+        # company_id is an equality prefix: $text queries must match it exactly
+        (
+            [("company_id", ASCENDING), ("customer.name", TEXT), ("invoice_number", TEXT), ("po_number", TEXT),
+             ("customer.gstin", TEXT)],
+            {
+                "name": "company_invoice_search_text",
+                "weights": {"invoice_number": 10, "customer.gstin": 10, "po_number": 5, "customer.name": 3},
+            }
+        ),
+    ],
+    "company_details": [
+        ([("id", ASCENDING)], {"name": "id_unique", "unique": True}),
+        ([("company_id", ASCENDING)], {"name": "company_id_unique", "unique": True}),
+    ],
+    "invoice_rollups": [
+        (
+            [("company_id", ASCENDING), ("dimension", ASCENDING), ("month", ASCENDING), ("key", ASCENDING)],
+            {"name": "company_dimension_month_key"}
+        ),
+    ],
+    "recurring_templates": [
+        ([("id", ASCENDING)], {"name": "id_unique", "unique": True}),
+        ([("company_id", ASCENDING), ("created_at", DESCENDING)], {"name": "company_created_at_desc"}),
+        # The scheduler serves every company at once
+        ([("active", ASCENDING), ("next_run_at", ASCENDING)], {"name": "active_next_run_at"}),
+    ],
+    "jobs": [
+        ([("id", ASCENDING)], {"name": "id_unique", "unique": True}),
+        ([("status", ASCENDING), ("created_at", ASCENDING)], {"name": "status_created_at"}),
+        (
+            [("finished_at", ASCENDING)],
+            {"name": "finished_at_ttl", "expireAfterSeconds": int(os.environ.get('JOB_RETENTION_DAYS', 7)) * 86400}
+        ),
+    ],
+}
+
+# Pre-tenancy indexes superseded by the company_id-prefixed ones above. The
+# global invoice_number_unique must go before two companies can share a
+# number, and a collection allows only one text index.
+RETIRED_INDEXES = {
+    "invoices": [
+        "invoice_number_unique", "created_at_id_desc", "customer_created_at", "invoice_date_desc",
+        "customer_gstin", "invoice_search_text",
+        # A prefix of company_invoice_date_id_desc, so redundant next to it
+        "company_invoice_date_desc",
+    ],
+    "invoice_rollups": ["dimension_month_key"],
+}
+
+# Collections holding documents that predate multi-company support
+TENANT_COLLECTIONS = ["invoices", "invoices_archive", "company_details", "recurring_templates"]
+# migrate.py's migration that assigns them to the default company
+TENANT_MIGRATION_VERSION = 2
+
+async def check_tenant_migration():
+    """Warn at startup while documents from before multi-company support remain
+
+    They are invisible to the tenant-filtered API until `migrate.py` assigns
+    them to the default company; `rebuild_rollups.py` must run after it. This
+    only reads, so every worker can run it without slowing readiness.
+    """
+    for collection in TENANT_COLLECTIONS:
+        checkpoint = await db.maintenance_checkpoints.find_one(
+            {"_id": f"migration:{collection}:{TENANT_MIGRATION_VERSION}"}, {"completed_at": 1}
+        )
+        if checkpoint and checkpoint.get('completed_at'):
+            continue
+        if await db[collection].find_one({"company_id": {"$exists": False}}, {"_id": 1}):
+            logger.warning(
+                "%s has documents without company_id that no company can see; "
+                "run migrate.py, then rebuild_rollups.py", collection
+            )
+
+async def ensure_indexes():
+    """Drop retired indexes and create all declared ones; existing identical indexes are a no-op"""
+    for collection, names in RETIRED_INDEXES.items():
+        existing = await db[collection].index_information()
+        for name in names:
+            if name in existing:
+                await db[collection].drop_index(name)
+                logger.info("Dropped retired index %s on %s", name, collection)
+
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                await db[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                # e.g. duplicate invoice numbers already stored; keep serving
+                logger.error("Could not create index %s on %s: %s", options["name"], collection, e)
+
+class FastJSONResponse(Response):
+    """JSON rendered with orjson; datetimes serialise natively with a Z suffix"""
+    media_type = "application/json"
+
+    def render(self, content):
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY)
+
+@asynccontextmanager
+async def lifespan(app):
+    global mongo_ready
+    await connect_mongo()
+    await ensure_indexes()
+    await check_tenant_migration()
+    job_queue.start(db.jobs)
+    scheduler = asyncio.create_task(run_recurring_scheduler()) if RECURRING_INTERVAL_SECONDS > 0 else None
+    mongo_ready = True
+    try:
+        yield
+    finally:
+        mongo_ready = False
+        if scheduler is not None:
+            scheduler.cancel()
+        await job_queue.stop()
+        client.close()
+        if pdf_executor is not None:
+            pdf_executor.shutdown(wait=False, cancel_futures=True)
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+def current_company_id(
+    x_company_id: Optional[str] = Header(None),
+    company_id: Optional[str] = Query(None, description="For links that cannot send X-Company-Id, e.g. PDFs"),
+):
+    """The company a request acts for: X-Company-Id, then ?company_id=, then the default"""
+    value = x_company_id or company_id or DEFAULT_COMPANY_ID
+    if not COMPANY_ID_PATTERN.match(value):
+        raise HTTPException(status_code=400, detail="Invalid company id")
+    return value
+
 # Define Models
 class CompanyDetails(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    company_id: str = DEFAULT_COMPANY_ID
     company_name: str
     address_line1: str
     address_line2: Optional[str] = ""
@@ -44,6 +414,7 @@ class CompanyDetails(BaseModel):
     ifsc_code: str
     branch: str
     branch_code: str
+    version: int = 0
 
 class CompanyDetailsCreate(BaseModel):
     company_name: str
@@ -104,6 +475,7 @@ class InvoiceTotals(BaseModel):
 
 class Invoice(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    company_id: str = DEFAULT_COMPANY_ID
     invoice_number: str
     invoice_date: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     due_date: datetime
@@ -118,9 +490,11 @@ class Invoice(BaseModel):
     notes: str = "This is a system-generated invoice and has been digitally signed. No physical signature is required. The GST is applied on the service charges."
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    version: int = 0
 
 class InvoiceCreate(BaseModel):
-    invoice_number: str
+    # Left empty, the server allocates the next number for the financial year
+    invoice_number: Optional[str] = None
     due_date: datetime
     payment_terms: str = "30 days"
     po_number: Optional[str] = ""
@@ -131,6 +505,110 @@ class InvoiceCreate(BaseModel):
     terms_conditions: Optional[str] = "Payment should be made within the specified due date. Interest @24% will be charged on delayed payments."
     notes: Optional[str] = "This is a system-generated invoice and has been digitally signed. No physical signature is required. The GST is applied on the service charges."
 
+class InvoicePage(BaseModel):
+    items: List[Invoice]
+    next_cursor: Optional[str] = None
+
+class BulkInvoiceResult(BaseModel):
+    index: int
+    status: Literal["created", "error"]
+    id: Optional[str] = None
+    invoice_number: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkInvoiceResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkInvoiceResult]
+
+class RecalculateResult(BaseModel):
+    scanned: int
+    changed: int
+    updated: int
+    dry_run: bool
+
+class RecalculateParams(BaseModel):
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    cgst_rate: Optional[float] = Field(None, ge=0, le=100)
+    sgst_rate: Optional[float] = Field(None, ge=0, le=100)
+    dry_run: bool = False
+    batch_size: int = Field(2000, ge=1, le=20000)
+
+class RenderPdfsParams(BaseModel):
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+class JobCreate(BaseModel):
+    type: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+class JobProgress(BaseModel):
+    done: int
+    total: Optional[int] = None
+
+class Job(BaseModel):
+    id: str
+    company_id: str = DEFAULT_COMPANY_ID
+    type: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    params: Dict[str, Any]
+    progress: Optional[JobProgress] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class RecurringTemplateCreate(BaseModel):
+    name: str
+    customer: Customer
+    place_of_supply: str
+    line_items: List[LineItem]
+    service_charges: ServiceCharge
+    cadence: Literal["monthly", "quarterly", "yearly"] = "monthly"
+    # Capped at 28 so every month has the day
+    day_of_month: int = Field(1, ge=1, le=28)
+    # First invoice goes out on the first matching day on or after this
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    due_in_days: int = Field(30, ge=0, le=365)
+    payment_terms: str = "30 days"
+    po_number: Optional[str] = ""
+    terms_conditions: Optional[str] = "Payment should be made within the specified due date. Interest @24% will be charged on delayed payments."
+    notes: Optional[str] = "This is a system-generated invoice and has been digitally signed. No physical signature is required. The GST is applied on the service charges."
+
+class RecurringTemplate(RecurringTemplateCreate):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    company_id: str = DEFAULT_COMPANY_ID
+    active: bool = True
+    next_run_at: datetime
+    last_period: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class RecurringRunResult(BaseModel):
+    templates: int
+    created: int
+    skipped: int
+    failed: int
+
+class RollupRow(BaseModel):
+    month: str
+    key: str
+    invoice_count: int
+    subtotal: float
+    service_charge: float
+    total_cgst: float
+    total_sgst: float
+    total_gst: float
+    grand_total: float
+
+class ReportSummary(BaseModel):
+    dimension: str
+    rows: List[RollupRow]
+
 class InvoiceUpdate(BaseModel):
     invoice_number: Optional[str] = None
     due_date: Optional[datetime] = None
@@ -142,33 +620,183 @@ class InvoiceUpdate(BaseModel):
     service_charges: Optional[ServiceCharge] = None
     terms_conditions: Optional[str] = None
     notes: Optional[str] = None
+    # Version the client last read; a stale value makes the update fail with 409
+    version: Optional[int] = None
+
+# Fields an Invoice cannot hold as null; an explicit null in a PUT leaves them unchanged
+NON_NULLABLE_UPDATE_FIELDS = [
+    name for name in InvoiceUpdate.model_fields
+    if name in Invoice.model_fields and type(None) not in get_args(Invoice.model_fields[name].annotation)
+]
+
+# Flat CSV layout for exports: nested blocks become prefixed columns
+CSV_SCALAR_FIELDS = ['id', 'invoice_number', 'invoice_date', 'due_date', 'payment_terms',
+                     'po_number', 'place_of_supply', 'created_at', 'updated_at']
+CSV_NESTED_FIELDS = {
+    'customer': list(Customer.model_fields),
+    'service_charges': list(ServiceCharge.model_fields),
+    'totals': list(InvoiceTotals.model_fields),
+}
+CSV_COLUMNS = (
+    CSV_SCALAR_FIELDS
+    + [f"{block}.{field}" for block, fields in CSV_NESTED_FIELDS.items() for field in fields]
+    + ['line_items', 'terms_conditions', 'notes']
+)
 
-def prepare_for_mongo(data):
-    """Convert datetime objects to ISO strings for MongoDB storage"""
-    if isinstance(data, dict):
-        for key, value in data.items():
+def to_utc(value):
+    """Normalise a datetime to UTC, treating naive values as already UTC"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def to_bson_datetime(value):
+    """UTC datetime truncated to the millisecond precision BSON stores"""
+    value = to_utc(value)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+class MongoCodec:
+    """Converts the datetime fields of a Pydantic model to and from BSON
+
+    The field layout is read once from the model annotations, so documents
+    are only touched where a datetime can actually live. Dates are stored as
+    native BSON datetimes; ISO strings written by older releases are still
+    parsed on the way out until migrate.py has been run.
+    """
+
+    def __init__(self, model):
+        self.datetime_fields = []
+        # field name -> (codec, is_list) for nested models holding datetimes
+        self.nested_fields = {}
+        for name, field in model.model_fields.items():
+            annotation, is_list = self._unwrap(field.annotation)
+            if annotation is datetime:
+                self.datetime_fields.append(name)
+            elif isinstance(annotation, type) and issubclass(annotation, BaseModel):
+                codec = MongoCodec(annotation)
+                if codec.datetime_fields or codec.nested_fields:
+                    self.nested_fields[name] = (codec, is_list)
+
+    @staticmethod
+    def _unwrap(annotation):
+        # Optional[X] -> X, List[X] -> (X, True)
+        if get_origin(annotation) is Union:
+            args = [arg for arg in get_args(annotation) if arg is not type(None)]
+            annotation = args[0] if len(args) == 1 else annotation
+        if get_origin(annotation) in (list, List):
+            return get_args(annotation)[0], True
+        return annotation, False
+
+    def to_mongo(self, data):
+        """Prepare a model dict for storage, in place"""
+        for name in self.datetime_fields:
+            value = data.get(name)
+            if isinstance(value, datetime):
+                data[name] = to_bson_datetime(value)
+        for name, (codec, is_list) in self.nested_fields.items():
+            value = data.get(name)
+            if value is not None:
+                data[name] = [codec.to_mongo(item) for item in value] if is_list else codec.to_mongo(value)
+        return data
+
+    def from_mongo(self, doc):
+        """Turn a stored document back into model input, in place"""
+        for name in self.datetime_fields:
+            value = doc.get(name)
             if isinstance(value, datetime):
-                data[key] = value.isoformat()
-            elif isinstance(value, dict):
-                data[key] = prepare_for_mongo(value)
-            elif isinstance(value, list):
-                data[key] = [prepare_for_mongo(item) if isinstance(item, dict) else item for item in value]
-    return data
-
-def parse_from_mongo(item):
-    """Parse datetime strings back to datetime objects from MongoDB"""
-    if isinstance(item, dict):
-        for key, value in item.items():
-            if key in ['invoice_date', 'due_date', 'created_at', 'updated_at'] and isinstance(value, str):
-                try:
-                    item[key] = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                except:
-                    pass
-            elif isinstance(value, dict):
-                item[key] = parse_from_mongo(value)
-            elif isinstance(value, list):
-                item[key] = [parse_from_mongo(i) if isinstance(i, dict) else i for i in value]
-    return item
+                if value.tzinfo is None:
+                    doc[name] = value.replace(tzinfo=timezone.utc)
+            elif isinstance(value, str):
+                doc[name] = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        for name, (codec, is_list) in self.nested_fields.items():
+            value = doc.get(name)
+            if value is not None:
+                doc[name] = [codec.from_mongo(item) for item in value] if is_list else codec.from_mongo(value)
+        return doc
+
+invoice_codec = MongoCodec(Invoice)
+template_codec = MongoCodec(RecurringTemplate)
+
+# Plain defaults Invoice would fill in, for documents written before a field
+# existed (e.g. version); factory defaults like id and dates are always stored
+INVOICE_DEFAULTS = {
+    name: field.default
+    for name, field in Invoice.model_fields.items()
+    if field.default is not PydanticUndefined
+}
+
+# What the API returns for an invoice; anything else stored with it is internal
+INVOICE_RESPONSE_FIELDS = frozenset(Invoice.model_fields)
+
+# Stamped on new invoices; migrate.py upgrades older documents to this version
+INVOICE_SCHEMA_VERSION = 2
+
+def invoice_for_insert(invoice):
+    """Invoice model -> document to insert, stamped with the schema version"""
+    doc = invoice_codec.to_mongo(invoice.dict())
+    doc['schema_version'] = INVOICE_SCHEMA_VERSION
+    return doc
+
+def invoice_document(doc):
+    """Stored invoice -> response-ready dict without building an Invoice
+
+    Documents are only ever written from validated models, so reads skip the
+    model round-trip and response validation and go straight to orjson. That
+    also skips response_model filtering, so bookkeeping fields stored next to
+    the invoice (schema_version, recurring_*) are dropped here instead.
+    """
+    invoice_codec.from_mongo(doc)
+    for name in doc.keys() - INVOICE_RESPONSE_FIELDS:
+        del doc[name]
+    for name, default in INVOICE_DEFAULTS.items():
+        doc.setdefault(name, default)
+    return doc
+
+def invoice_date_filter(date_from=None, date_to=None):
+    """Build an invoice_date range filter against native BSON datetimes"""
+    query = {}
+    if date_from or date_to:
+        query['invoice_date'] = {}
+        if date_from:
+            query['invoice_date']['$gte'] = to_utc(date_from)
+        if date_to:
+            query['invoice_date']['$lte'] = to_utc(date_to)
+    return query
+
+def encode_cursor(sort_value, invoice_id):
+    """Encode the (created_at or invoice_date, id) sort key of the last row into an opaque cursor"""
+    raw = json.dumps([to_utc(sort_value).isoformat(), invoice_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """Decode an opaque cursor back into its (datetime, id) sort key"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, invoice_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(invoice_id, str):
+            raise ValueError
+        return datetime.fromisoformat(sort_value), invoice_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def invoice_etag(invoice):
+    """Strong ETag for an invoice from its id, version and updated_at"""
+    updated_at = invoice.get('updated_at')
+    if isinstance(updated_at, str):
+        updated_at = datetime.fromisoformat(updated_at.replace('Z', '+00:00'))
+    if isinstance(updated_at, datetime):
+        updated_at = to_bson_datetime(updated_at).isoformat()
+    raw = f"{invoice['id']}|{invoice.get('version', 0)}|{updated_at}".encode()
+    return f'"{hashlib.sha1(raw).hexdigest()[:20]}"'
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in [tag[2:] if tag.startswith('W/') else tag for tag in candidates]
+
+def not_modified(etag):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache", "Vary": "X-Company-Id"})
 
 def number_to_words(number):
     """Convert number to words (Indian numbering system)"""
@@ -246,116 +874,1153 @@ def calculate_totals_and_gst(line_items, service_charges):
         amount_in_words=amount_in_words
     )
 
+def calculate_totals_batch(invoices):
+    """Vectorised calculate_totals_and_gst over many stored invoice documents
+
+    Each document needs `line_items[].amount` and `service_charges`. Results
+    are bit-for-bit identical to the scalar function: line items are summed
+    left to right per invoice (one vectorised add per item position) rather
+    than with numpy's pairwise sum.
+    """
+    count = len(invoices)
+    lengths = np.fromiter((len(inv['line_items']) for inv in invoices), dtype=np.int64, count=count)
+    amounts = np.fromiter(
+        (item['amount'] for inv in invoices for item in inv['line_items']),
+        dtype=np.float64, count=int(lengths.sum())
+    )
+    owners = np.repeat(np.arange(count), lengths)
+    positions = np.arange(len(amounts)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    # Group items by position; within a group each invoice appears at most once
+    order = np.argsort(positions, kind='stable')
+    bounds = np.searchsorted(positions[order], np.arange(int(lengths.max(initial=0)) + 1))
+    subtotal = np.zeros(count)
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        subtotal[owners[order[start:end]]] += amounts[order[start:end]]
+
+    service_amount = np.array([inv['service_charges']['amount'] for inv in invoices], dtype=np.float64)
+    cgst_rate = np.array([inv['service_charges'].get('cgst_rate', 9.0) for inv in invoices], dtype=np.float64)
+    sgst_rate = np.array([inv['service_charges'].get('sgst_rate', 9.0) for inv in invoices], dtype=np.float64)
+
+    cgst_amount = (service_amount * cgst_rate) / 100
+    sgst_amount = (service_amount * sgst_rate) / 100
+    total_gst = cgst_amount + sgst_amount
+    grand_total = subtotal + service_amount + total_gst
+
+    results = []
+    for i in range(count):
+        results.append({
+            "service_charges": {
+                "cgst_amount": float(cgst_amount[i]),
+                "sgst_amount": float(sgst_amount[i]),
+                "total_gst": float(total_gst[i]),
+            },
+            "totals": InvoiceTotals(
+                subtotal=float(subtotal[i]),
+                service_charge=float(service_amount[i]),
+                total_cgst=float(cgst_amount[i]),
+                total_sgst=float(sgst_amount[i]),
+                total_gst=float(total_gst[i]),
+                grand_total=float(grand_total[i]),
+                amount_in_words=number_to_words(float(grand_total[i]))
+            ).dict(),
+        })
+    return results
+
+# Server-side invoice numbering: one counter per Indian financial year
+# (April-March), advanced atomically in blocks so a bulk request reserves all
+# of its numbers in a single round-trip
+INVOICE_NUMBER_FORMAT = os.environ.get('INVOICE_NUMBER_FORMAT', "INV/{fy}/{seq:06d}")
+FINANCIAL_YEAR_TZ = ZoneInfo(os.environ.get('FINANCIAL_YEAR_TZ', "Asia/Kolkata"))
+
+def financial_year(moment):
+    """Financial year label such as 2026-27 for the given instant"""
+    local = to_utc(moment).astimezone(FINANCIAL_YEAR_TZ)
+    start = local.year if local.month >= 4 else local.year - 1
+    return f"{start}-{(start + 1) % 100:02d}"
+
+def invoice_counter_id(company_id, fy):
+    # The default company keeps the pre-tenancy counter so its sequence continues
+    if company_id == DEFAULT_COMPANY_ID:
+        return f"invoice_number:{fy}"
+    return f"invoice_number:{company_id}:{fy}"
+
+async def allocate_invoice_numbers(company_id, count, moment=None):
+    """Reserve `count` consecutive invoice numbers for a company with one atomic $inc"""
+    if count <= 0:
+        return []
+    fy = financial_year(moment or datetime.now(timezone.utc))
+    counter = await db.counters.find_one_and_update(
+        {"_id": invoice_counter_id(company_id, fy)},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    first = counter['seq'] - count + 1
+    return [INVOICE_NUMBER_FORMAT.format(fy=fy, seq=seq) for seq in range(first, counter['seq'] + 1)]
+
+# Monthly revenue/GST rollups, kept current with $inc deltas on every write.
+# rebuild_rollups.py recomputes the same documents with an aggregation
+# pipeline, so the _id layout "<company_id>|<YYYY-MM>|<dimension>|<key>"
+# must match it.
+ROLLUP_FIELDS = ['subtotal', 'service_charge', 'total_cgst', 'total_sgst', 'total_gst', 'grand_total']
+ROLLUP_DIMENSIONS = ['all', 'customer', 'place_of_supply']
+ROLLUP_PROJECTION = {"_id": 0, "company_id": 1, "invoice_date": 1, "customer.name": 1, "place_of_supply": 1, "totals": 1}
+
+def rollup_contributions(invoice, sign):
+    """The $inc an invoice adds (sign=1) or removes (sign=-1) per rollup document"""
+    invoice_date = invoice['invoice_date']
+    if isinstance(invoice_date, str):
+        invoice_date = datetime.fromisoformat(invoice_date.replace('Z', '+00:00'))
+    # Local calendar month, matching invoice dates as printed and billed
+    month = to_utc(invoice_date).astimezone(FINANCIAL_YEAR_TZ).strftime("%Y-%m")
+    company_id = invoice.get('company_id', DEFAULT_COMPANY_ID)
+    inc = {"invoice_count": sign}
+    for field in ROLLUP_FIELDS:
+        inc[field] = sign * invoice['totals'][field]
+    keys = {
+        'all': "",
+        'customer': invoice['customer']['name'],
+        'place_of_supply': invoice['place_of_supply'],
+    }
+    return [
+        (f"{company_id}|{month}|{dimension}|{key}", company_id, month, dimension, key, inc)
+        for dimension, key in keys.items()
+    ]
+
+async def apply_rollup_deltas(removed=(), added=()):
+    """Fold invoice removals/additions into the rollups with one bulk_write"""
+    deltas = {}
+    for invoices, sign in ((removed, -1), (added, 1)):
+        for invoice in invoices:
+            for rollup_id, company_id, month, dimension, key, inc in rollup_contributions(invoice, sign):
+                if rollup_id not in deltas:
+                    identity = {"company_id": company_id, "month": month, "dimension": dimension, "key": key}
+                    deltas[rollup_id] = (identity, dict(inc))
+                else:
+                    total = deltas[rollup_id][1]
+                    for field, value in inc.items():
+                        total[field] += value
+
+    operations = [
+        UpdateOne({"_id": rollup_id}, {"$inc": inc, "$setOnInsert": identity}, upsert=True)
+        for rollup_id, (identity, inc) in deltas.items()
+        if any(inc.values())
+    ]
+    if not operations:
+        return
+    try:
+        await db.invoice_rollups.bulk_write(operations, ordered=False)
+    except Exception as e:
+        # The invoice write already succeeded; rebuild_rollups.py repairs drift
+        logger.error("Failed to update invoice rollups: %s", e)
+
 # Company Details Routes
 @api_router.post("/company", response_model=CompanyDetails)
-async def create_or_update_company_details(company_data: CompanyDetailsCreate):
+async def create_or_update_company_details(
+    company_data: CompanyDetailsCreate,
+    company_id: str = Depends(current_company_id),
+):
     try:
-        # Check if company details already exist
-        existing = await db.company_details.find_one({})
-        
-        if existing:
-            # Update existing
-            company_dict = prepare_for_mongo(company_data.dict())
-            await db.company_details.update_one({}, {"$set": company_dict})
-            company_dict['id'] = existing.get('id', str(uuid.uuid4()))
-        else:
-            # Create new
-            company = CompanyDetails(**company_data.dict())
-            company_dict = prepare_for_mongo(company.dict())
-            await db.company_details.insert_one(company_dict)
-            
-        return CompanyDetails(**parse_from_mongo(company_dict))
+        # Upsert the company's record and bump its version in one round-trip
+        company_dict = company_data.dict()
+        company = await db.company_details.find_one_and_update(
+            {"company_id": company_id},
+            {
+                "$set": company_dict,
+                "$inc": {"version": 1},
+                "$setOnInsert": {"id": str(uuid.uuid4())},
+            },
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        company_cache.set(company_id, company)
+
+        return CompanyDetails(**company)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @api_router.get("/company", response_model=Optional[CompanyDetails])
-async def get_company_details():
+async def get_company_details(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    company_id: str = Depends(current_company_id),
+):
     try:
-        company = await db.company_details.find_one({})
+        company = await company_cache.get(company_id)
+        # Same URL for every company, so caches must key on the header too
+        response.headers['Vary'] = "X-Company-Id"
         if company:
-            return CompanyDetails(**parse_from_mongo(company))
+            etag = f'"company-{company_id}-{company.get("version", 0)}"'
+            if if_none_match and etag_matches(if_none_match, etag):
+                return not_modified(etag)
+            response.headers['ETag'] = etag
+            response.headers['Cache-Control'] = "no-cache"
+            return CompanyDetails(**company)
         return None
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Invoice Routes
 @api_router.post("/invoices", response_model=Invoice)
-async def create_invoice(invoice_data: InvoiceCreate):
+async def create_invoice(invoice_data: InvoiceCreate, company_id: str = Depends(current_company_id)):
     try:
+        if not invoice_data.invoice_number:
+            invoice_data.invoice_number = (await allocate_invoice_numbers(company_id, 1))[0]
+
         # Calculate totals and GST
         totals = calculate_totals_and_gst(invoice_data.line_items, invoice_data.service_charges)
         
         # Create invoice object
         invoice = Invoice(
             **invoice_data.dict(),
+            company_id=company_id,
             totals=totals
         )
         
         # Prepare for MongoDB storage
-        invoice_dict = prepare_for_mongo(invoice.dict())
+        invoice_dict = invoice_for_insert(invoice)
         await db.invoices.insert_one(invoice_dict)
+        await apply_rollup_deltas(added=[invoice_dict])
         
-        return invoice
+        # Echo what was stored (millisecond dates), not the in-memory model
+        invoice_dict.pop('_id', None)
+        return FastJSONResponse(invoice_document(invoice_dict))
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Invoice number already exists")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@api_router.get("/invoices", response_model=List[Invoice])
-async def get_invoices():
+# Largest batch one request may create; bigger imports are split by the client
+BULK_MAX_INVOICES = int(os.environ.get('BULK_MAX_INVOICES', 10000))
+
+@api_router.post("/invoices/bulk", response_model=BulkInvoiceResponse)
+async def create_invoices_bulk(
+    invoices_data: List[Dict[str, Any]],
+    chunk_size: int = Query(500, ge=1, le=5000),
+    company_id: str = Depends(current_company_id),
+):
+    if len(invoices_data) > BULK_MAX_INVOICES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {BULK_MAX_INVOICES} invoices per request; got {len(invoices_data)}"
+        )
+
+    # Validate every payload up front; bad items are reported, not raised
+    results = []
+    valid = []
+    seen_numbers = set()
+    for index, raw in enumerate(invoices_data):
+        try:
+            invoice_data = InvoiceCreate(**raw)
+        except ValidationError as e:
+            results.append(BulkInvoiceResult(index=index, status="error", error=str(e)))
+            continue
+        if invoice_data.invoice_number and invoice_data.invoice_number in seen_numbers:
+            results.append(BulkInvoiceResult(
+                index=index, status="error", invoice_number=invoice_data.invoice_number,
+                error="Duplicate invoice number within batch"
+            ))
+            continue
+        if invoice_data.invoice_number:
+            seen_numbers.add(invoice_data.invoice_number)
+        valid.append((index, invoice_data))
+
+    # Number everything that came without one from a single reserved block
+    unnumbered = [invoice_data for _, invoice_data in valid if not invoice_data.invoice_number]
+    try:
+        numbers = await allocate_invoice_numbers(company_id, len(unnumbered))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    for invoice_data, number in zip(unnumbered, numbers):
+        invoice_data.invoice_number = number
+
+    pending = []
+    for index, invoice_data in valid:
+        totals = calculate_totals_and_gst(invoice_data.line_items, invoice_data.service_charges)
+        invoice = Invoice(**invoice_data.dict(), company_id=company_id, totals=totals)
+        pending.append((index, invoice))
+
+    # Unordered inserts let the server keep going past per-document failures
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        documents = [invoice_for_insert(invoice) for _, invoice in chunk]
+        failed = {}
+        try:
+            await db.invoices.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get('writeErrors', []):
+                if write_error.get('code') == 11000:
+                    failed[write_error['index']] = "Invoice number already exists"
+                else:
+                    failed[write_error['index']] = write_error.get('errmsg', "Insert failed")
+        except Exception as e:
+            failed = {position: str(e) for position in range(len(chunk))}
+
+        await apply_rollup_deltas(
+            added=[document for position, document in enumerate(documents) if position not in failed]
+        )
+        for position, (index, invoice) in enumerate(chunk):
+            results.append(BulkInvoiceResult(
+                index=index,
+                status="error" if position in failed else "created",
+                id=None if position in failed else invoice.id,
+                invoice_number=invoice.invoice_number,
+                error=failed.get(position)
+            ))
+
+    results.sort(key=lambda result: result.index)
+    created = sum(1 for result in results if result.status == "created")
+    return BulkInvoiceResponse(created=created, failed=len(results) - created, results=results)
+
+async def recalculate_totals(params, company_id, progress=None):
+    """Recompute a company's stored totals, optionally applying new GST rates, and fix drift
+
+    `progress`, if given, is awaited with the running scanned count after
+    each batch. Writes are guarded on the version read, so an invoice edited
+    meanwhile keeps its edit and counts as changed but not updated.
+    """
+    date_from, date_to = params.date_from, params.date_to
+    cgst_rate, sgst_rate = params.cgst_rate, params.sgst_rate
+    dry_run, batch_size = params.dry_run, params.batch_size
+    query = {"company_id": company_id, **invoice_date_filter(date_from, date_to)}
+    projection = {**ROLLUP_PROJECTION, "id": 1, "version": 1, "line_items.amount": 1, "service_charges": 1}
+    scanned = changed = updated = 0
+
+    async def flush(batch):
+        nonlocal changed, updated
+        stored_charges = [dict(invoice['service_charges']) for invoice in batch]
+        for invoice in batch:
+            if cgst_rate is not None:
+                invoice['service_charges']['cgst_rate'] = cgst_rate
+            if sgst_rate is not None:
+                invoice['service_charges']['sgst_rate'] = sgst_rate
+
+        now = to_bson_datetime(datetime.now(timezone.utc))
+        operations = []
+        before, after = [], []
+        for invoice, stored, result in zip(batch, stored_charges, calculate_totals_batch(batch)):
+            service_charges = {**invoice['service_charges'], **result['service_charges']}
+            # Only rewrite invoices whose stored figures actually differ
+            if invoice.get('totals') == result['totals'] and stored == service_charges:
+                continue
+            # Invoices written before versioning have no field; None matches that
+            operations.append(UpdateOne({"id": invoice['id'], "version": invoice.get('version')}, {
+                "$set": {
+                    "service_charges": service_charges,
+                    "totals": result['totals'],
+                    "updated_at": now,
+                },
+                "$inc": {"version": 1},
+            }))
+            before.append(invoice)
+            after.append({**invoice, "totals": result['totals']})
+
+        changed += len(operations)
+        if operations and not dry_run:
+            write_result = await db.invoices.bulk_write(operations, ordered=False)
+            updated += write_result.modified_count
+            if write_result.matched_count < len(operations):
+                # Some invoices were edited since the read; only fold in our own writes
+                written = set()
+                async for head in db.invoices.find(
+                    {"id": {"$in": [invoice['id'] for invoice in before]}, "updated_at": now},
+                    {"_id": 0, "id": 1, "version": 1}
+                ):
+                    written.add((head['id'], head.get('version')))
+                kept = [
+                    position for position, invoice in enumerate(before)
+                    if (invoice['id'], (invoice.get('version') or 0) + 1) in written
+                ]
+                before = [before[position] for position in kept]
+                after = [after[position] for position in kept]
+            await apply_rollup_deltas(removed=before, added=after)
+
+    batch = []
+    async for invoice in db.invoices.find(query, projection).batch_size(batch_size):
+        scanned += 1
+        batch.append(invoice)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+            if progress:
+                await progress(scanned)
+    if batch:
+        await flush(batch)
+        if progress:
+            await progress(scanned)
+
+    return RecalculateResult(scanned=scanned, changed=changed, updated=updated, dry_run=dry_run)
+
+@api_router.post("/invoices/recalculate", response_model=RecalculateResult)
+async def recalculate_invoices(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    cgst_rate: Optional[float] = Query(None, ge=0, le=100),
+    sgst_rate: Optional[float] = Query(None, ge=0, le=100),
+    dry_run: bool = False,
+    batch_size: int = Query(2000, ge=1, le=20000),
+    company_id: str = Depends(current_company_id),
+):
+    """Recompute stored totals inline; submit a "recalculate" job for large ranges"""
+    try:
+        return await recalculate_totals(RecalculateParams(
+            date_from=date_from, date_to=date_to, cgst_rate=cgst_rate, sgst_rate=sgst_rate,
+            dry_run=dry_run, batch_size=batch_size,
+        ), company_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Fields the invoice list page renders; served by ?view=summary
+SUMMARY_FIELDS = ['id', 'invoice_number', 'invoice_date', 'due_date', 'customer.name',
+                  'place_of_supply', 'totals']
+
+def sparse_projection(fields, view):
+    """Mongo projection for ?fields= / ?view=summary, or None for full documents"""
+    if fields:
+        requested = [field.strip() for field in fields.split(',') if field.strip()]
+    elif view == "summary":
+        requested = SUMMARY_FIELDS
+    else:
+        return None
+
+    requested = list(dict.fromkeys(requested))
+    for field in requested:
+        if not invoice_field_path_exists(field):
+            raise HTTPException(status_code=400, detail=f"Unknown field: {field}")
+    # MongoDB rejects a projection naming both a path and one inside it
+    for field in requested:
+        for other in requested:
+            if other.startswith(field + '.'):
+                raise HTTPException(status_code=400, detail=f"Overlapping fields: {field}, {other}")
+    return {"_id": 0, **{field: 1 for field in requested}}
+
+def invoice_field_path_exists(path):
+    """True if a dotted path names a field of Invoice or of its nested models"""
+    model = Invoice
+    for segment in path.split('.'):
+        if model is None or segment not in model.model_fields:
+            return False
+        annotation, _ = MongoCodec._unwrap(model.model_fields[segment].annotation)
+        model = annotation if isinstance(annotation, type) and issubclass(annotation, BaseModel) else None
+    return True
+
+@api_router.get("/invoices", response_model=InvoicePage)
+async def get_invoices(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    customer: Optional[str] = None,
+    fields: Optional[str] = None,
+    view: Literal["full", "summary"] = "full",
+    company_id: str = Depends(current_company_id),
+):
+    query = {"company_id": company_id, **invoice_date_filter(date_from, date_to)}
+    if customer:
+        query['customer.name'] = customer
+
+    # A date range pages on the key it filters, so the index scan stays
+    # inside the range instead of walking the company's whole history
+    sort_key = 'invoice_date' if date_from or date_to else 'created_at'
+
+    # Keyset pagination: resume strictly after the last (sort key, id) seen
+    if cursor:
+        last_value, last_id = decode_cursor(cursor)
+        query['$or'] = [
+            {sort_key: {'$lt': last_value}},
+            {sort_key: last_value, 'id': {'$lt': last_id}},
+        ]
+
+    projection = sparse_projection(fields, view)
+    extra_keys = []
+    if projection is not None:
+        # The cursor needs the sort key even when the caller did not ask for it
+        extra_keys = [key for key in (sort_key, 'id') if key not in projection]
+        projection.update({key: 1 for key in extra_keys})
+
+    try:
+        # Fetch one extra row to know whether another page exists
+        invoices = await db.invoices.find(query, projection or {"_id": 0}).sort(
+            [(sort_key, -1), ("id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+
+        has_more = len(invoices) > limit
+        if projection is None:
+            invoices = [invoice_document(invoice) for invoice in invoices[:limit]]
+        else:
+            invoices = [invoice_codec.from_mongo(invoice) for invoice in invoices[:limit]]
+
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_cursor(invoices[-1][sort_key], invoices[-1]['id'])
+
+        if projection is not None:
+            for invoice in invoices:
+                for key in extra_keys:
+                    invoice.pop(key, None)
+        # Returning the response directly skips response_model validation
+        return FastJSONResponse({"items": invoices, "next_cursor": next_cursor})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def flatten_invoice_row(invoice):
+    """Flatten a stored invoice document into a CSV row following CSV_COLUMNS"""
+    row = [invoice.get(field, "") for field in CSV_SCALAR_FIELDS]
+    row = [value.isoformat() if isinstance(value, datetime) else value for value in row]
+    for block, fields in CSV_NESTED_FIELDS.items():
+        nested = invoice.get(block) or {}
+        row.extend(nested.get(field, "") for field in fields)
+    row.append(json.dumps(invoice.get('line_items', [])))
+    row.append(invoice.get('terms_conditions', ""))
+    row.append(invoice.get('notes', ""))
+    return row
+
+async def stream_invoices_export(query, export_format):
+    """Yield export chunks one cursor batch at a time so memory stays flat"""
+    cursor = db.invoices.find(query, {"_id": 0}).sort("invoice_date", 1).batch_size(500)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(CSV_COLUMNS)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    try:
+        async for invoice in cursor:
+            if export_format == "csv":
+                writer.writerow(flatten_invoice_row(invoice))
+            else:
+                buffer.write(orjson.dumps(invoice, option=orjson.OPT_UTC_Z | orjson.OPT_APPEND_NEWLINE).decode())
+            # Flush in ~64KB chunks rather than one write per row
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    except Exception as e:
+        # Headers are already sent, so the client only sees a truncated body
+        logger.error("Invoice export aborted: %s", e)
+        raise
+    finally:
+        await cursor.close()
+
+@api_router.get("/invoices/export")
+async def export_invoices(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    date_from: Optional[datetime] = Query(None, alias="from"),
+    date_to: Optional[datetime] = Query(None, alias="to"),
+    company_id: str = Depends(current_company_id),
+):
+    query = {"company_id": company_id, **invoice_date_filter(date_from, date_to)}
+
+    if format == "csv":
+        media_type, filename = "text/csv", "invoices.csv"
+    else:
+        media_type, filename = "application/x-ndjson", "invoices.ndjson"
+
+    return StreamingResponse(
+        stream_invoices_export(query, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+SEARCH_MAX_RESULTS = 1000
+
+async def stream_invoice_pdf_zip(query, company_id, progress=None):
+    """Yield a ZIP of a company's invoice PDFs, rendering across the whole process pool
+
+    Invoices are streamed from a cursor with a bounded number of renders in
+    flight; each PDF is added to the archive as soon as it is ready, so
+    entries are in completion order rather than date order.
+    """
+    company = await company_cache.get(company_id)
+    cursor = db.invoices.find(query, {"_id": 0}).sort("invoice_date", 1).batch_size(PDF_RENDER_WORKERS * 4)
+    sink = ZipChunks()
+    pending = set()
+    entry_names = set()
+    done = 0
+
+    async def render(invoice):
+        return invoice, await cached_invoice_pdf(invoice, company)
+
     try:
-        invoices = await db.invoices.find().sort("created_at", -1).to_list(1000)
-        return [Invoice(**parse_from_mongo(invoice)) for invoice in invoices]
+        # PDFs are already deflated; storing them keeps the zip step near free
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+            async def add_finished(wait_for):
+                nonlocal done
+                finished, _ = await asyncio.wait(pending, return_when=wait_for)
+                for task in finished:
+                    # Until its result is taken a task stays pending, so a
+                    # failure here still leaves the rest for the cleanup below
+                    pending.discard(task)
+                    invoice, pdf = task.result()
+                    archive.writestr(zip_entry_name(invoice, entry_names), pdf)
+                done += len(finished)
+                if progress:
+                    await progress(done)
+
+            async for invoice in cursor:
+                if len(pending) >= PDF_RENDER_WORKERS * 2:
+                    await add_finished(asyncio.FIRST_COMPLETED)
+                    yield sink.drain()
+                pending.add(asyncio.create_task(render(invoice)))
+            while pending:
+                await add_finished(asyncio.FIRST_COMPLETED)
+                yield sink.drain()
+        # Central directory, written on close
+        yield sink.drain()
+    except Exception as e:
+        logger.error("Invoice PDF archive aborted: %s", e)
+        raise
+    finally:
+        # Client went away or a render failed: stop the rest and collect their
+        # outcomes so none is reported as an exception never retrieved
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        await cursor.close()
+
+@api_router.post("/invoices/archive")
+async def archive_invoice_pdfs(
+    date_from: Optional[datetime] = Query(None, alias="from"),
+    date_to: Optional[datetime] = Query(None, alias="to"),
+    company_id: str = Depends(current_company_id),
+):
+    """Stream every invoice in the range as PDFs in one ZIP
+
+    For very large ranges submit a "pdf_archive" job instead; it writes the
+    same ZIP to PDF_ARCHIVE_DIR on the server.
+    """
+    query = {"company_id": company_id, **invoice_date_filter(date_from, date_to)}
+    period = "-".join(value.strftime("%Y%m%d") for value in (date_from, date_to) if value) or "all"
+    return StreamingResponse(
+        stream_invoice_pdf_zip(query, company_id),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="invoices-{period}.zip"'}
+    )
+
+@api_router.get("/invoices/search", response_model=InvoicePage)
+async def search_invoices(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    company_id: str = Depends(current_company_id),
+):
+    q = q.strip()
+    try:
+        offset = int(cursor) if cursor else 0
+        if offset < 0:
+            raise ValueError
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    window = min(offset + limit + 1, SEARCH_MAX_RESULTS)
+
+    try:
+        # Rank on ids alone, then fetch just the page's documents, so deep
+        # pages don't drag every earlier invoice over the wire
+        ranked = []
+        seen = set()
+
+        # Tier 1: anchored, case-sensitive prefixes stay on the index bounds of
+        # company_invoice_number_unique and company_customer_gstin (GSTINs
+        # are always upper case)
+        if q and " " not in q:
+            prefixes = list({re.compile("^" + re.escape(q)), re.compile("^" + re.escape(q.upper()))})
+            for field in ("invoice_number", "customer.gstin"):
+                async for invoice in db.invoices.find(
+                    {"company_id": company_id, field: {"$in": prefixes}}, {"_id": 0, "id": 1}
+                ).sort(field, ASCENDING).limit(window):
+                    if invoice['id'] not in seen:
+                        seen.add(invoice['id'])
+                        ranked.append(invoice['id'])
+
+        # Tier 2: full-text relevance over names, numbers, PO numbers and GSTINs
+        if len(ranked) < window:
+            async for invoice in db.invoices.find(
+                {"company_id": company_id, "$text": {"$search": q}},
+                {"_id": 0, "id": 1, "score": {"$meta": "textScore"}}
+            ).sort([("score", {"$meta": "textScore"})]).limit(window):
+                if invoice['id'] not in seen:
+                    seen.add(invoice['id'])
+                    ranked.append(invoice['id'])
+
+        page_ids = ranked[offset:offset + limit]
+        invoices = {}
+        if page_ids:
+            async for invoice in db.invoices.find({"company_id": company_id, "id": {"$in": page_ids}}, {"_id": 0}):
+                invoices[invoice['id']] = invoice
+        has_more = len(ranked) > offset + limit and offset + limit < SEARCH_MAX_RESULTS
+        return FastJSONResponse({
+            # Rank order; an invoice deleted since ranking is simply left out
+            "items": [invoice_document(invoices[invoice_id]) for invoice_id in page_ids if invoice_id in invoices],
+            "next_cursor": str(offset + limit) if has_more else None,
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/invoices/{invoice_id}", response_model=Invoice)
-async def get_invoice(invoice_id: str):
+async def get_invoice(
+    invoice_id: str,
+    if_none_match: Optional[str] = Header(None),
+    company_id: str = Depends(current_company_id),
+):
     try:
-        invoice = await db.invoices.find_one({"id": invoice_id})
+        # Revalidation reads just the ETag inputs, not the whole document
+        if if_none_match:
+            head = await db.invoices.find_one(
+                {"id": invoice_id, "company_id": company_id}, {"_id": 0, "id": 1, "version": 1, "updated_at": 1}
+            )
+            if not head:
+                raise HTTPException(status_code=404, detail="Invoice not found")
+            etag = invoice_etag(head)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+
+        invoice = await db.invoices.find_one({"id": invoice_id, "company_id": company_id}, {"_id": 0})
         if not invoice:
             raise HTTPException(status_code=404, detail="Invoice not found")
-        return Invoice(**parse_from_mongo(invoice))
+        return FastJSONResponse(
+            invoice_document(invoice),
+            headers={"ETag": invoice_etag(invoice), "Cache-Control": "no-cache", "Vary": "X-Company-Id"}
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/invoices/{invoice_id}/pdf")
+async def get_invoice_pdf(invoice_id: str, company_id: str = Depends(current_company_id)):
+    invoice = await db.invoices.find_one({"id": invoice_id, "company_id": company_id}, {"_id": 0})
+    if not invoice:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    company = await company_cache.get(company_id)
+
+    try:
+        pdf = await cached_invoice_pdf(invoice, company)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    filename = pdf_filename(invoice)
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'inline; filename="{filename}.pdf"'}
+    )
+
+# Re-reads a partial PUT makes when a concurrent edit changed the stored half
+PARTIAL_UPDATE_ATTEMPTS = 3
+
 @api_router.put("/invoices/{invoice_id}", response_model=Invoice)
-async def update_invoice(invoice_id: str, invoice_data: InvoiceUpdate):
+async def update_invoice(
+    invoice_id: str,
+    invoice_data: InvoiceUpdate,
+    company_id: str = Depends(current_company_id),
+):
     try:
-        # Get existing invoice
-        existing_invoice = await db.invoices.find_one({"id": invoice_id})
-        if not existing_invoice:
-            raise HTTPException(status_code=404, detail="Invoice not found")
-        
         # Update only provided fields
         update_data = invoice_data.dict(exclude_unset=True)
-        if update_data:
-            update_data['updated_at'] = datetime.now(timezone.utc)
-            
-            # If line_items or service_charges are updated, recalculate totals
-            if 'line_items' in update_data or 'service_charges' in update_data:
-                existing_invoice.update(update_data)
-                parsed_invoice = parse_from_mongo(existing_invoice)
-                invoice_obj = Invoice(**parsed_invoice)
-                
-                totals = calculate_totals_and_gst(invoice_obj.line_items, invoice_obj.service_charges)
+        expected_version = update_data.pop('version', None)
+        for key in NON_NULLABLE_UPDATE_FIELDS:
+            if key in update_data and update_data[key] is None:
+                del update_data[key]
+
+        query = {"id": invoice_id, "company_id": company_id}
+        if expected_version is not None:
+            # Invoices written before versioning have no field; treat as 0
+            query['version'] = expected_version if expected_version else {"$in": [0, None]}
+
+        if not update_data:
+            invoice = await db.invoices.find_one(query, {"_id": 0})
+            if not invoice:
+                raise await invoice_update_miss(invoice_id, company_id, expected_version)
+            return FastJSONResponse(invoice_document(invoice))
+
+        # If line_items or service_charges are updated, recalculate totals from
+        # just those two fields; the stored half is fetched only when missing
+        recompute = 'line_items' in update_data or 'service_charges' in update_data
+        for _ in range(PARTIAL_UPDATE_ATTEMPTS):
+            write_query = query
+            if recompute:
+                line_items = invoice_data.line_items
+                service_charges = invoice_data.service_charges
+                if line_items is None or service_charges is None:
+                    missing = 'service_charges' if line_items is not None else 'line_items'
+                    stored = await db.invoices.find_one(query, {"_id": 0, missing: 1, "version": 1})
+                    if not stored:
+                        raise await invoice_update_miss(invoice_id, company_id, expected_version)
+                    if expected_version is None:
+                        # The totals depend on the half we just read, so the
+                        # write only lands if nobody changed it in between
+                        write_query = {**query, "version": stored.get('version') or {"$in": [0, None]}}
+                    if line_items is None:
+                        line_items = [LineItem(**item) for item in stored['line_items']]
+                    else:
+                        service_charges = ServiceCharge(**stored['service_charges'])
+
+                totals = calculate_totals_and_gst(line_items, service_charges)
+                update_data['service_charges'] = service_charges.dict()
                 update_data['totals'] = totals.dict()
-            
-            # Prepare for MongoDB update
-            prepared_data = prepare_for_mongo(update_data)
-            await db.invoices.update_one({"id": invoice_id}, {"$set": prepared_data})
-        
-        # Get updated invoice
-        updated_invoice = await db.invoices.find_one({"id": invoice_id})
-        return Invoice(**parse_from_mongo(updated_invoice))
+
+            update_data['updated_at'] = datetime.now(timezone.utc)
+
+            # One round-trip: conditional write that hands back the old document,
+            # which the rollups need; the new one is the old plus our $set
+            set_data = invoice_codec.to_mongo(update_data)
+            previous_invoice = await db.invoices.find_one_and_update(
+                write_query,
+                {"$set": set_data, "$inc": {"version": 1}},
+                projection={"_id": 0},
+                return_document=ReturnDocument.BEFORE
+            )
+            if previous_invoice:
+                break
+            if write_query is query:
+                raise await invoice_update_miss(invoice_id, company_id, expected_version)
+            # Lost the race for the half we read: read it again
+        else:
+            raise HTTPException(
+                status_code=409,
+                detail="Invoice is being modified concurrently; try again"
+            )
+        updated_invoice = {**previous_invoice, **set_data, "version": previous_invoice.get('version', 0) + 1}
+
+        if {'totals', 'customer', 'place_of_supply'} & set_data.keys():
+            await apply_rollup_deltas(removed=[previous_invoice], added=[updated_invoice])
+        return FastJSONResponse(invoice_document(updated_invoice))
+    except HTTPException:
+        raise
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Invoice number already exists")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def invoice_update_miss(invoice_id, company_id, expected_version):
+    """Tell a missing invoice apart from a stale version after a failed write"""
+    if expected_version is not None and await db.invoices.find_one(
+        {"id": invoice_id, "company_id": company_id}, {"_id": 1}
+    ):
+        return HTTPException(
+            status_code=409,
+            detail="Invoice was modified by someone else; reload it and try again"
+        )
+    return HTTPException(status_code=404, detail="Invoice not found")
+
 @api_router.delete("/invoices/{invoice_id}")
-async def delete_invoice(invoice_id: str):
+async def delete_invoice(invoice_id: str, company_id: str = Depends(current_company_id)):
     try:
-        result = await db.invoices.delete_one({"id": invoice_id})
-        if result.deleted_count == 0:
+        deleted = await db.invoices.find_one_and_delete(
+            {"id": invoice_id, "company_id": company_id}, projection=ROLLUP_PROJECTION
+        )
+        if not deleted:
             raise HTTPException(status_code=404, detail="Invoice not found")
+        await apply_rollup_deltas(removed=[deleted])
         return {"message": "Invoice deleted successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Report Routes
+@api_router.get("/reports/summary", response_model=ReportSummary)
+async def get_report_summary(
+    dimension: Literal["all", "customer", "place_of_supply"] = "all",
+    month_from: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    month_to: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    company_id: str = Depends(current_company_id),
+):
+    # Reads only pre-aggregated rollups, so cost is independent of invoice count
+    query = {"company_id": company_id, "dimension": dimension}
+    if month_from or month_to:
+        query['month'] = {}
+        if month_from:
+            query['month']['$gte'] = month_from
+        if month_to:
+            query['month']['$lte'] = month_to
+
+    try:
+        rollups = await db.invoice_rollups.find(query, {"_id": 0}).sort(
+            [("month", ASCENDING), ("key", ASCENDING)]
+        ).to_list(None)
+        rows = [
+            # $inc of floats accumulates tiny errors; report to the paisa
+            RollupRow(
+                month=rollup['month'],
+                key=rollup['key'],
+                invoice_count=rollup['invoice_count'],
+                **{field: round(rollup[field], 2) for field in ROLLUP_FIELDS}
+            )
+            for rollup in rollups
+            if rollup['invoice_count'] > 0
+        ]
+        return ReportSummary(dimension=dimension, rows=rows)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+RECURRING_CADENCE_MONTHS = {"monthly": 1, "quarterly": 3, "yearly": 12}
+# Periods generated per template in one run when the scheduler was down
+RECURRING_MAX_CATCH_UP = 12
+RECURRING_INTERVAL_SECONDS = int(os.environ.get('RECURRING_INTERVAL_SECONDS', 900))
+RECURRING_LEASE_ID = "recurring_scheduler"
+RECURRING_LEASE_SECONDS = int(os.environ.get('RECURRING_LEASE_SECONDS', 120))
+# The lease is per process; this keeps the scheduler and a manual run apart within one
+recurring_run_lock = asyncio.Lock()
+
+def recurring_run_at(year, month, day_of_month):
+    """Local midnight of the billing day, in UTC"""
+    return datetime(year, month, day_of_month, tzinfo=FINANCIAL_YEAR_TZ).astimezone(timezone.utc)
+
+def first_recurring_run(day_of_month, start):
+    """First billing day on or after `start`"""
+    local = to_utc(start).astimezone(FINANCIAL_YEAR_TZ)
+    if local.day > day_of_month:
+        return recurring_run_at(local.year + local.month // 12, local.month % 12 + 1, day_of_month)
+    return recurring_run_at(local.year, local.month, day_of_month)
+
+def next_recurring_run(run_at, template):
+    local = to_utc(run_at).astimezone(FINANCIAL_YEAR_TZ)
+    months = local.month - 1 + RECURRING_CADENCE_MONTHS[template['cadence']]
+    return recurring_run_at(local.year + months // 12, months % 12 + 1, template['day_of_month'])
+
+def recurring_period(run_at):
+    """Billing period key, e.g. 2026-10; at most one run per month per template"""
+    local = to_utc(run_at).astimezone(FINANCIAL_YEAR_TZ)
+    return f"{local.year}-{local.month:02d}"
+
+async def acquire_lease(name, seconds):
+    """Claim or renew a named lease for this process; False while another holds it"""
+    now = datetime.now(timezone.utc)
+    try:
+        # Matches only our own or an expired lease; otherwise the upsert
+        # collides with the live holder's _id
+        await db.leases.find_one_and_update(
+            {"_id": name, "$or": [{"owner": job_queue.owner}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"owner": job_queue.owner, "expires_at": now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+async def release_lease(name):
+    await db.leases.update_one(
+        {"_id": name, "owner": job_queue.owner}, {"$set": {"expires_at": datetime.now(timezone.utc)}}
+    )
+
+async def generate_recurring_invoices(now=None, company_id=None):
+    """Bill due templates unless another run holds the lease; returns None if it does
+
+    Every uvicorn worker runs the scheduler, and overlapping runs would each
+    reserve invoice numbers that the losing run's inserts then discard,
+    leaving gaps in the sequence. One lease serialises them.
+    """
+    if recurring_run_lock.locked():
+        return None
+    async with recurring_run_lock:
+        if not await acquire_lease(RECURRING_LEASE_ID, RECURRING_LEASE_SECONDS):
+            return None
+
+        async def renew():
+            while True:
+                await asyncio.sleep(RECURRING_LEASE_SECONDS / 3)
+                await acquire_lease(RECURRING_LEASE_ID, RECURRING_LEASE_SECONDS)
+
+        renewal = asyncio.create_task(renew())
+        try:
+            return await bill_recurring_templates(now, company_id)
+        finally:
+            renewal.cancel()
+            await release_lease(RECURRING_LEASE_ID)
+
+async def bill_recurring_templates(now=None, company_id=None):
+    """Bill every due template period in one batch; safe to run repeatedly
+
+    Invoices carry (recurring_template_id, recurring_period) under a unique
+    index, and templates are only advanced after their invoices exist, so a
+    crash never bills a period twice. The scheduler bills every company;
+    pass company_id to bill just one.
+    """
+    now = now or datetime.now(timezone.utc)
+    query = {"active": True, "next_run_at": {"$lte": now}}
+    if company_id is not None:
+        query['company_id'] = company_id
+    templates = await db.recurring_templates.find(query, {"_id": 0}).to_list(None)
+
+    due = []
+    # template id -> (stored next_run_at, new next_run_at, last period, still active)
+    advances = {}
+    for template in templates:
+        template = template_codec.from_mongo(template)
+        end_date = template.get('end_date')
+        run_at, last_period = template['next_run_at'], template.get('last_period')
+        for _ in range(RECURRING_MAX_CATCH_UP):
+            if run_at > now or (end_date and run_at > end_date):
+                break
+            last_period = recurring_period(run_at)
+            due.append((template, run_at, last_period))
+            run_at = next_recurring_run(run_at, template)
+        active = not (end_date and run_at > end_date)
+        advances[template['id']] = (template['next_run_at'], run_at, last_period, active)
+
+    # Periods billed by an earlier run that stopped before advancing its template
+    skipped = 0
+    if due:
+        billed = set()
+        async for invoice in db.invoices.find(
+            {"recurring_template_id": {"$in": list(advances)},
+             "recurring_period": {"$in": sorted({period for _, _, period in due})}},
+            {"_id": 0, "recurring_template_id": 1, "recurring_period": 1}
+        ):
+            billed.add((invoice['recurring_template_id'], invoice['recurring_period']))
+        remaining = [entry for entry in due if (entry[0]['id'], entry[2]) not in billed]
+        skipped = len(due) - len(remaining)
+        # Chronological, so invoice numbers follow invoice dates
+        due = sorted(remaining, key=lambda entry: entry[1])
+
+    documents = []
+    if due:
+        totals = calculate_totals_batch([
+            {"line_items": template['line_items'], "service_charges": template['service_charges']}
+            for template, _, _ in due
+        ])
+        # Numbers come from each company's sequence for the financial year of
+        # the invoice's own date
+        numbers = {}
+        by_year = {}
+        for position, (template, run_at, _) in enumerate(due):
+            by_year.setdefault((template['company_id'], financial_year(run_at)), []).append(position)
+        for (template_company_id, _), positions in by_year.items():
+            allocated = await allocate_invoice_numbers(template_company_id, len(positions), due[positions[0]][1])
+            numbers.update(zip(positions, allocated))
+
+        for position, ((template, run_at, period), result) in enumerate(zip(due, totals)):
+            invoice = Invoice(
+                company_id=template['company_id'],
+                invoice_number=numbers[position],
+                invoice_date=run_at,
+                due_date=run_at + timedelta(days=template['due_in_days']),
+                payment_terms=template['payment_terms'],
+                po_number=template.get('po_number'),
+                place_of_supply=template['place_of_supply'],
+                customer=template['customer'],
+                line_items=template['line_items'],
+                service_charges={**template['service_charges'], **result['service_charges']},
+                totals=result['totals'],
+                terms_conditions=template['terms_conditions'],
+                notes=template['notes'],
+            )
+            document = invoice_for_insert(invoice)
+            document['recurring_template_id'] = template['id']
+            document['recurring_period'] = period
+            documents.append(document)
+
+    failed = {}
+    if documents:
+        try:
+            await db.invoices.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get('writeErrors', []):
+                failed[write_error['index']] = write_error
+        await apply_rollup_deltas(added=[doc for position, doc in enumerate(documents) if position not in failed])
+
+    # A duplicate period means another run billed it; anything else is retried next run
+    duplicates = 0
+    retry = set()
+    for position, write_error in failed.items():
+        if write_error.get('code') == 11000 and 'recurring_template_period' in write_error.get('errmsg', ''):
+            duplicates += 1
+            continue
+        retry.add(documents[position]['recurring_template_id'])
+        logger.error("Recurring invoice for template %s period %s not created: %s",
+                     documents[position]['recurring_template_id'], documents[position]['recurring_period'],
+                     write_error.get('errmsg'))
+
+    operations = [
+        UpdateOne(
+            # Guarded on the value read, so concurrent schedulers advance it once
+            {"id": template_id, "next_run_at": to_bson_datetime(stored_next)},
+            {"$set": {"next_run_at": to_bson_datetime(next_run_at), "last_period": last_period,
+                      "active": active, "updated_at": to_bson_datetime(now)}}
+        )
+        for template_id, (stored_next, next_run_at, last_period, active) in advances.items()
+        if template_id not in retry
+    ]
+    if operations:
+        await db.recurring_templates.bulk_write(operations, ordered=False)
+
+    return RecurringRunResult(
+        templates=len(templates), created=len(documents) - len(failed),
+        skipped=skipped + duplicates, failed=len(failed) - duplicates
+    )
+
+async def run_recurring_scheduler():
+    """Generate due recurring invoices every RECURRING_INTERVAL_SECONDS"""
+    while True:
+        try:
+            result = await generate_recurring_invoices()
+            if result and (result.created or result.failed):
+                logger.info("Recurring invoices: %d created, %d skipped, %d failed",
+                            result.created, result.skipped, result.failed)
+        except Exception:
+            logger.exception("Recurring invoice run failed")
+        await asyncio.sleep(RECURRING_INTERVAL_SECONDS)
+
+@api_router.post("/recurring-templates", response_model=RecurringTemplate)
+async def create_recurring_template(
+    template_data: RecurringTemplateCreate,
+    company_id: str = Depends(current_company_id),
+):
+    try:
+        start = template_data.start_date or datetime.now(timezone.utc)
+        template = RecurringTemplate(
+            **template_data.dict(),
+            company_id=company_id,
+            next_run_at=first_recurring_run(template_data.day_of_month, start)
+        )
+        await db.recurring_templates.insert_one(template_codec.to_mongo(template.dict()))
+        return template
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/recurring-templates", response_model=List[RecurringTemplate])
+async def get_recurring_templates(company_id: str = Depends(current_company_id)):
+    try:
+        templates = await db.recurring_templates.find(
+            {"company_id": company_id}, {"_id": 0}
+        ).sort("created_at", DESCENDING).to_list(1000)
+        return [template_codec.from_mongo(template) for template in templates]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/recurring-templates/{template_id}", response_model=RecurringTemplate)
+async def get_recurring_template(template_id: str, company_id: str = Depends(current_company_id)):
+    template = await db.recurring_templates.find_one({"id": template_id, "company_id": company_id}, {"_id": 0})
+    if not template:
+        raise HTTPException(status_code=404, detail="Recurring template not found")
+    return template_codec.from_mongo(template)
+
+@api_router.delete("/recurring-templates/{template_id}")
+async def delete_recurring_template(template_id: str, company_id: str = Depends(current_company_id)):
+    # Invoices already issued keep their recurring_template_id
+    result = await db.recurring_templates.delete_one({"id": template_id, "company_id": company_id})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Recurring template not found")
+    return {"message": "Recurring template deleted successfully"}
+
+@api_router.post("/recurring-templates/run", response_model=RecurringRunResult)
+async def run_recurring_templates(company_id: str = Depends(current_company_id)):
+    """Bill the company's due templates now instead of waiting for the scheduler"""
+    try:
+        result = await generate_recurring_invoices(company_id=company_id)
+        if result is None:
+            raise HTTPException(status_code=409, detail="A recurring invoice run is already in progress")
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -364,24 +2029,127 @@ async def delete_invoice(invoice_id: str):
 async def root():
     return {"message": "Professional Tax Invoicing App API is running"}
 
+@job_queue.handler("recalculate", RecalculateParams)
+async def recalculate_job(params, job):
+    company_id = job.company_id or DEFAULT_COMPANY_ID
+    total = await db.invoices.count_documents(
+        {"company_id": company_id, **invoice_date_filter(params.date_from, params.date_to)}
+    )
+    await job.progress(0, total)
+    result = await recalculate_totals(params, company_id, progress=lambda scanned: job.progress(scanned, total))
+    return result.dict()
+
+@job_queue.handler("render_pdfs", RenderPdfsParams)
+async def render_pdfs_job(params, job):
+    """Warm the PDF cache for every invoice in a date range"""
+    company_id = job.company_id or DEFAULT_COMPANY_ID
+    query = {"company_id": company_id, **invoice_date_filter(params.date_from, params.date_to)}
+    total = await db.invoices.count_documents(query)
+    company = await company_cache.get(company_id)
+    done = 0
+    await job.progress(done, total)
+
+    # Keep every render worker busy without loading the whole range at once
+    pending = set()
+    async for invoice in db.invoices.find(query, {"_id": 0}):
+        if len(pending) >= PDF_RENDER_WORKERS * 2:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                task.result()
+            done += len(finished)
+            await job.progress(done, total)
+        pending.add(asyncio.create_task(cached_invoice_pdf(invoice, company)))
+    for task in asyncio.as_completed(pending):
+        await task
+        done += 1
+    await job.progress(done, total)
+    return {"rendered": done}
+
+@job_queue.handler("pdf_archive", RenderPdfsParams)
+async def pdf_archive_job(params, job):
+    """Write a ZIP of the range's invoice PDFs to PDF_ARCHIVE_DIR"""
+    company_id = job.company_id or DEFAULT_COMPANY_ID
+    query = {"company_id": company_id, **invoice_date_filter(params.date_from, params.date_to)}
+    total = await db.invoices.count_documents(query)
+    await job.progress(0, total)
+
+    PDF_ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    path = PDF_ARCHIVE_DIR / f"invoices-{job.id}.zip"
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as fh:
+        async for chunk in stream_invoice_pdf_zip(query, company_id, progress=lambda done: job.progress(done, total)):
+            await asyncio.to_thread(fh.write, chunk)
+    os.replace(tmp_path, path)
+    return {"path": str(path), "invoices": job.progress_state["done"], "bytes": path.stat().st_size}
+
+@api_router.post("/jobs", response_model=Job, status_code=202)
+async def submit_job(job_data: JobCreate, company_id: str = Depends(current_company_id)):
+    try:
+        return await job_queue.submit(job_data.type, job_data.params, company_id)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: str, company_id: str = Depends(current_company_id)):
+    job = await job_queue.get(job_id, company_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# Readiness probe: 503 until the pool is warm and while MongoDB is unreachable
+@api_router.get("/health/ready")
+async def readiness():
+    pool_options = client.options.pool_options if client is not None else None
+    pool = {
+        "max_pool_size": pool_options.max_pool_size if pool_options else None,
+        "min_pool_size": pool_options.min_pool_size if pool_options else None,
+        "open_connections": pool_metrics.open_connections,
+        "checked_out": pool_metrics.checked_out,
+    }
+    if not mongo_ready:
+        return FastJSONResponse({"status": "starting", "pool": pool}, status_code=503)
+    try:
+        started = time.perf_counter()
+        await client.admin.command("ping")
+        ping_ms = (time.perf_counter() - started) * 1000
+    except Exception as e:
+        return FastJSONResponse({"status": "unavailable", "error": str(e), "pool": pool}, status_code=503)
+    return {"status": "ready", "ping_ms": round(ping_ms, 2), "pool": pool}
+
+# Prometheus scrape target; per-process, so scrape each uvicorn worker
+@api_router.get("/metrics")
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 # Include the router in the main app
 app.include_router(api_router)
 
+# brotli for clients that accept it, gzip otherwise; PDFs are already compressed
+app.add_middleware(
+    BrotliMiddleware,
+    minimum_size=int(os.environ.get('COMPRESSION_MIN_BYTES', 1024)),
+    gzip_fallback=True,
+    excluded_handlers=[r"^/api/invoices/[^/]+/pdf$", r"^/api/invoices/archive$"],
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# Outermost, so timings include compression and CORS handling
+app.add_middleware(MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks and regression gate for the per-request helpers
+
+Times number_to_words, calculate_totals_and_gst, calculate_totals_batch and
+the MongoCodec read/write paths on realistic invoices (1, 50 and 5000 line
+items, amounts up to crores) and compares them with benchmarks/baselines.json.
+Runs offline; nothing talks to MongoDB.
+
+    python benchmarks/bench_helpers.py               # check, exit 1 on regression
+    python benchmarks/bench_helpers.py --update      # re-record baselines
+    python benchmarks/bench_helpers.py --tolerance 0.5
+
+Timings are stored relative to a fixed pure-Python calibration loop measured
+in the same run, so a baseline recorded on one machine stays meaningful on
+another.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / 'backend'))
+
+from server import (  # noqa: E402
+    Customer, Invoice, LineItem, ServiceCharge, calculate_totals_and_gst,
+    calculate_totals_batch, invoice_codec, invoice_document, number_to_words,
+)
+
+BASELINE_PATH = BENCH_DIR / 'baselines.json'
+LINE_ITEM_COUNTS = (1, 50, 5000)
+# Up to 999 crore, the largest amount number_to_words can spell; fractional paise included
+AMOUNTS = [0, 7, 45.5, 99_999.99, 12_34_567.25, 1_23_45_678.5, 99_99_99_999.99]
+
+
+def calibration():
+    """Fixed interpreter-bound workload used to normalise timings"""
+    total = 0
+    for i in range(2000):
+        total += (i * 31) % 7
+    return total
+
+def make_line_items(count, rng):
+    items = []
+    for i in range(count):
+        quantity = rng.randint(1, 50)
+        rate = round(rng.uniform(1, 1_00_000), 2)
+        items.append(LineItem(description=f"Item {i}", hsn_sac="998314", quantity=quantity,
+                              rate=rate, amount=round(quantity * rate, 2)))
+    return items
+
+def make_invoice(count, rng):
+    line_items = make_line_items(count, rng)
+    service_charges = ServiceCharge(description="Service charge", amount=round(rng.uniform(1000, 5_00_000), 2))
+    return Invoice(
+        invoice_number="BENCH/2026-27/000001",
+        due_date=datetime(2026, 12, 31, tzinfo=timezone.utc),
+        place_of_supply="Karnataka",
+        customer=Customer(name="Bench Customer", address_line1="1 MG Road", city="Bengaluru",
+                          state="Karnataka", zip_code="560001", gstin="29ABCDE1234F1Z5"),
+        line_items=line_items,
+        service_charges=service_charges,
+        totals=calculate_totals_and_gst(line_items, service_charges),
+    )
+
+def build_cases():
+    """name -> zero-argument callable; inputs are built once, outside timing"""
+    rng = random.Random(17)
+    cases = {"number_to_words[amounts]": lambda: [number_to_words(amount) for amount in AMOUNTS]}
+
+    for count in LINE_ITEM_COUNTS:
+        invoice = make_invoice(count, rng)
+        line_items, service_charges = invoice.line_items, invoice.service_charges
+        stored = invoice_codec.to_mongo(invoice.model_dump())
+
+        cases[f"calculate_totals_and_gst[{count}]"] = (
+            lambda line_items=line_items, service_charges=service_charges:
+                calculate_totals_and_gst(line_items, service_charges)
+        )
+        cases[f"codec.to_mongo[{count}]"] = lambda stored=stored: invoice_codec.to_mongo(stored)
+        cases[f"codec.from_mongo[{count}]"] = lambda stored=stored: invoice_codec.from_mongo(stored)
+        cases[f"invoice_document[{count}]"] = lambda stored=stored: invoice_document(stored)
+
+    batch = [
+        {"line_items": [{"amount": item.amount} for item in make_line_items(50, rng)],
+         "service_charges": {"amount": 15000.0, "cgst_rate": 9.0, "sgst_rate": 9.0}}
+        for _ in range(200)
+    ]
+    cases["calculate_totals_batch[200x50]"] = lambda: calculate_totals_batch(batch)
+    return cases
+
+def best_time(func, min_seconds=0.1, repeat=7):
+    """Best-of-N seconds per call, auto-sizing the loop count"""
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_seconds / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def run(cases):
+    # Re-measure the calibration loop around every case and keep the best, so
+    # a noisy moment at start-up does not skew every ratio
+    reference = best_time(calibration)
+    timings = {}
+    for name, func in cases.items():
+        timings[name] = best_time(func)
+        reference = min(reference, best_time(calibration))
+    results = {name: {"us": seconds * 1e6, "relative": seconds / reference} for name, seconds in timings.items()}
+    return reference, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update", action="store_true", help="record the current timings as baselines")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown vs baseline before failing (0.25 = 25%%)")
+    parser.add_argument("--retries", type=int, default=3, help="re-time apparent regressions this many times")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    args = parser.parse_args()
+
+    cases = {name: func for name, func in build_cases().items() if args.filter in name}
+    reference, results = run(cases)
+
+    if args.update:
+        # Record the median of a few rounds so one lucky run does not set the bar
+        rounds = [results] + [run(cases)[1] for _ in range(2)]
+        baselines = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        baselines.update({
+            name: round(statistics.median(round_results[name]["relative"] for round_results in rounds), 4)
+            for name in results
+        })
+        BASELINE_PATH.write_text(json.dumps(dict(sorted(baselines.items())), indent=2) + "\n")
+        print(f"Recorded {len(results)} baselines in {BASELINE_PATH.name}")
+
+    baselines = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    # One slow sample is usually scheduler noise: re-time apparent regressions
+    # a few times and keep the best before failing the run
+    for _ in range(args.retries):
+        suspects = {name: cases[name] for name, result in results.items()
+                    if baselines.get(name) and result["relative"] / baselines[name] - 1 > args.tolerance}
+        if not suspects:
+            break
+        retry_reference, retried = run(suspects)
+        reference = min(reference, retry_reference)
+        for name, result in retried.items():
+            if result["relative"] < results[name]["relative"]:
+                results[name] = result
+
+    print(f"calibration: {reference * 1e6:.1f} us")
+    print(f"{'benchmark':<34} | {'us/call':>10} | {'relative':>9} | {'baseline':>9} | {'change':>7}")
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline:
+            change = result["relative"] / baseline - 1
+            marker = ""
+            if change > args.tolerance:
+                regressions.append(name)
+                marker = "  <-- REGRESSION"
+            print(f"{name:<34} | {result['us']:>10.2f} | {result['relative']:>9.3f} | "
+                  f"{baseline:>9.3f} | {change:>+6.0%}{marker}")
+        else:
+            print(f"{name:<34} | {result['us']:>10.2f} | {result['relative']:>9.3f} | {'-':>9} | {'new':>7}")
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than baseline by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
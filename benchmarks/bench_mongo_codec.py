@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Per-request cost of the old recursive ISO-string walkers vs MongoCodec
+
+Runs offline: only the pure helpers from backend/server.py are exercised.
+"""
+import copy
+import sys
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from server import Invoice, invoice_codec, calculate_totals_and_gst, LineItem, ServiceCharge, Customer  # noqa: E402
+
+
+def legacy_prepare_for_mongo(data):
+    """The walker removed in favour of MongoCodec, kept here as the baseline"""
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if isinstance(value, datetime):
+                data[key] = value.isoformat()
+            elif isinstance(value, dict):
+                data[key] = legacy_prepare_for_mongo(value)
+            elif isinstance(value, list):
+                data[key] = [legacy_prepare_for_mongo(item) if isinstance(item, dict) else item for item in value]
+    return data
+
+def legacy_parse_from_mongo(item):
+    if isinstance(item, dict):
+        for key, value in item.items():
+            if key in ['invoice_date', 'due_date', 'created_at', 'updated_at'] and isinstance(value, str):
+                try:
+                    item[key] = datetime.fromisoformat(value.replace('Z', '+00:00'))
+                except:
+                    pass
+            elif isinstance(value, dict):
+                item[key] = legacy_parse_from_mongo(value)
+            elif isinstance(value, list):
+                item[key] = [legacy_parse_from_mongo(i) if isinstance(i, dict) else i for i in value]
+    return item
+
+def build_invoice(line_item_count):
+    line_items = [
+        LineItem(description=f"Item {i}", hsn_sac="998314", quantity=1, rate=1250.5, amount=1250.5)
+        for i in range(line_item_count)
+    ]
+    service_charges = ServiceCharge(description="Service charge", amount=15000)
+    return Invoice(
+        invoice_number="BENCH-0001",
+        due_date=datetime(2026, 12, 31, tzinfo=timezone.utc),
+        place_of_supply="Karnataka",
+        customer=Customer(name="Bench Customer", address_line1="1 MG Road", city="Bengaluru",
+                          state="Karnataka", zip_code="560001"),
+        line_items=line_items,
+        service_charges=service_charges,
+        totals=calculate_totals_and_gst(line_items, service_charges),
+    ).dict()
+
+def measure(func, template, number):
+    # Copy outside the timed region; both codecs mutate in place
+    copies = [copy.deepcopy(template) for _ in range(number)]
+    iterator = iter(copies)
+    return timeit.timeit(lambda: func(next(iterator)), number=number) / number * 1e6
+
+def main():
+    print(f"{'line items':>10} | {'step':<6} | {'legacy us':>10} | {'codec us':>10} | {'speedup':>7}")
+    for line_item_count, number in ((1, 2000), (50, 500), (5000, 20)):
+        invoice = build_invoice(line_item_count)
+        stored_legacy = legacy_prepare_for_mongo(copy.deepcopy(invoice))
+        stored_native = invoice_codec.to_mongo(copy.deepcopy(invoice))
+
+        rows = [
+            ("write", measure(legacy_prepare_for_mongo, invoice, number),
+             measure(invoice_codec.to_mongo, invoice, number)),
+            ("read", measure(legacy_parse_from_mongo, stored_legacy, number),
+             measure(invoice_codec.from_mongo, stored_native, number)),
+        ]
+        for step, legacy, codec in rows:
+            print(f"{line_item_count:>10} | {step:<6} | {legacy:>10.2f} | {codec:>10.2f} | {legacy / codec:>6.1f}x")
+
+if __name__ == "__main__":
+    main()
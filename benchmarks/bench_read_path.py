@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Read-path throughput: model + response_model validation vs orjson fast path
+
+Serialises the same stored documents the way GET /api/invoices/{id} and
+GET /api/invoices (page of 50) did before and after the fast path, and
+reports the resulting requests/sec ceiling with database time excluded.
+Runs offline against the helpers in backend/server.py.
+"""
+import asyncio
+import copy
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from server import (  # noqa: E402
+    Customer, FastJSONResponse, Invoice, InvoicePage, LineItem, ServiceCharge,
+    calculate_totals_and_gst, invoice_codec, invoice_document,
+)
+
+PAGE_SIZE = 50
+
+
+def stored_invoice(line_item_count):
+    line_items = [
+        LineItem(description=f"Item {i}", hsn_sac="998314", quantity=2, rate=625.25, amount=1250.5)
+        for i in range(line_item_count)
+    ]
+    service_charges = ServiceCharge(description="Service charge", amount=15000)
+    invoice = Invoice(
+        invoice_number="BENCH-0001",
+        due_date=datetime(2026, 12, 31, tzinfo=timezone.utc),
+        place_of_supply="Karnataka",
+        customer=Customer(name="Bench Customer", address_line1="1 MG Road", city="Bengaluru",
+                          state="Karnataka", zip_code="560001", gstin="29ABCDE1234F1Z5"),
+        line_items=line_items,
+        service_charges=service_charges,
+        totals=calculate_totals_and_gst(line_items, service_charges),
+    )
+    return invoice_codec.to_mongo(invoice.model_dump())
+
+async def legacy_get_invoice(field, doc):
+    invoice = Invoice(**invoice_codec.from_mongo(doc))
+    content = await serialize_response(field=field, response_content=invoice)
+    return JSONResponse(content).body
+
+async def fast_get_invoice(doc):
+    return FastJSONResponse(invoice_document(doc)).body
+
+async def legacy_get_invoices(field, docs):
+    page = InvoicePage(items=[Invoice(**invoice_codec.from_mongo(doc)) for doc in docs], next_cursor="x")
+    content = await serialize_response(field=field, response_content=page)
+    return JSONResponse(content).body
+
+async def fast_get_invoices(docs):
+    return FastJSONResponse({"items": [invoice_document(doc) for doc in docs], "next_cursor": "x"}).body
+
+async def requests_per_second(make_call, templates, seconds=1.0):
+    # Documents are mutated in place by the readers, as with fresh Mongo reads
+    calls = 0
+    elapsed = 0.0
+    while elapsed < seconds:
+        batch = [copy.deepcopy(templates) for _ in range(20)]
+        started = time.perf_counter()
+        for docs in batch:
+            await make_call(docs)
+        elapsed += time.perf_counter() - started
+        calls += len(batch)
+    return calls / elapsed
+
+async def main():
+    invoice_field = create_response_field(name="Response_get_invoice", type_=Invoice)
+    page_field = create_response_field(name="Response_get_invoices", type_=InvoicePage)
+
+    print(f"{'endpoint':<22} | {'line items':>10} | {'before rps':>10} | {'after rps':>10} | {'speedup':>7}")
+    for line_item_count in (5, 50):
+        doc = stored_invoice(line_item_count)
+        page = [copy.deepcopy(doc) for _ in range(PAGE_SIZE)]
+        cases = [
+            ("GET /invoices/{id}", doc,
+             lambda d: legacy_get_invoice(invoice_field, d), fast_get_invoice),
+            (f"GET /invoices ({PAGE_SIZE})", page,
+             lambda d: legacy_get_invoices(page_field, d), fast_get_invoices),
+        ]
+        for name, template, legacy, fast in cases:
+            before = await requests_per_second(legacy, template)
+            after = await requests_per_second(fast, template)
+            print(f"{name:<22} | {line_item_count:>10} | {before:>10.0f} | {after:>10.0f} | {after / before:>6.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
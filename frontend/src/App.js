@@ -8,11 +8,16 @@ import { Input } from "./components/ui/input";
 import { Label } from "./components/ui/label";
 import { Textarea } from "./components/ui/textarea";
 import { Separator } from "./components/ui/separator";
-import { Trash2, Plus, FileText, Calculator, Edit, Eye, Settings, Building, Printer } from "lucide-react";
+import { Trash2, Plus, FileText, Calculator, Edit, Eye, Settings, Building, Printer, Download } from "lucide-react";
 import { toast, Toaster } from "sonner";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+// Optional: which company this deployment acts for; the server falls back to its default
+const COMPANY_ID = process.env.REACT_APP_COMPANY_ID;
+if (COMPANY_ID) {
+  axios.defaults.headers.common["X-Company-Id"] = COMPANY_ID;
+}
 
 // Company Settings Component
 const CompanySettings = () => {
@@ -271,7 +276,6 @@ const InvoiceForm = ({ isEdit = false }) => {
     if (isEdit && id) {
       fetchInvoice();
     } else {
-      generateInvoiceNumber();
       setDefaultDueDate();
     }
   }, [isEdit, id]);
@@ -291,16 +295,6 @@ const InvoiceForm = ({ isEdit = false }) => {
     }
   };
 
-  const generateInvoiceNumber = () => {
-    const date = new Date();
-    const year = date.getFullYear();
-    const month = String(date.getMonth() + 1).padStart(2, '0');
-    const day = String(date.getDate()).padStart(2, '0');
-    const random = Math.floor(Math.random() * 1000).toString().padStart(3, '0');
-    const invoiceNum = `INV-${year}${month}${day}-${random}`;
-    setInvoiceData(prev => ({ ...prev, invoice_number: invoiceNum }));
-  };
-
   const setDefaultDueDate = () => {
     const date = new Date();
     date.setDate(date.getDate() + 30); // 30 days from now
@@ -374,7 +368,11 @@ const InvoiceForm = ({ isEdit = false }) => {
       navigate('/');
     } catch (error) {
       console.error('Error saving invoice:', error);
-      toast.error("Failed to save invoice");
+      if (error.response?.status === 409) {
+        toast.error(error.response.data.detail);
+      } else {
+        toast.error("Failed to save invoice");
+      }
     } finally {
       setIsSubmitting(false);
     }
@@ -405,7 +403,8 @@ const InvoiceForm = ({ isEdit = false }) => {
                 <Input
                   value={invoiceData.invoice_number}
                   onChange={(e) => setInvoiceData(prev => ({ ...prev, invoice_number: e.target.value }))}
-                  required
+                  placeholder={isEdit ? undefined : "Assigned automatically"}
+                  required={isEdit}
                 />
               </div>
               <div>
@@ -837,6 +836,12 @@ const InvoiceView = () => {
           <Printer className="h-4 w-4 mr-2" />
           Print
         </Button>
+        <Button asChild variant="outline">
+          <a href={`${API}/invoices/${id}/pdf${COMPANY_ID ? `?company_id=${encodeURIComponent(COMPANY_ID)}` : ''}`} target="_blank" rel="noopener noreferrer">
+            <Download className="h-4 w-4 mr-2" />
+            PDF
+          </a>
+        </Button>
         <Button onClick={() => navigate(`/edit/${id}`)} variant="outline">
           <Edit className="h-4 w-4 mr-2" />
           Edit
@@ -999,12 +1004,19 @@ const InvoiceView = () => {
 // Invoice List Component
 const InvoiceList = () => {
   const [invoices, setInvoices] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [searchQuery, setSearchQuery] = useState('');
+  const [activeQuery, setActiveQuery] = useState('');
 
-  const fetchInvoices = async () => {
+  const fetchInvoices = async (cursor = null, query = activeQuery) => {
     try {
-      const response = await axios.get(`${API}/invoices`);
-      setInvoices(response.data);
+      const params = cursor ? { cursor } : {};
+      const response = query
+        ? await axios.get(`${API}/invoices/search`, { params: { ...params, q: query } })
+        : await axios.get(`${API}/invoices`, { params: { ...params, view: 'summary' } });
+      setInvoices(prev => cursor ? [...prev, ...response.data.items] : response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error fetching invoices:', error);
       toast.error("Failed to fetch invoices");
@@ -1026,6 +1038,13 @@ const InvoiceList = () => {
     }
   };
 
+  const handleSearch = (e) => {
+    e.preventDefault();
+    const query = searchQuery.trim();
+    setActiveQuery(query);
+    fetchInvoices(null, query);
+  };
+
   useEffect(() => {
     fetchInvoices();
   }, []);
@@ -1046,6 +1065,15 @@ const InvoiceList = () => {
         </Link>
       </div>
 
+      <form onSubmit={handleSearch} className="flex gap-2">
+        <Input
+          value={searchQuery}
+          onChange={(e) => setSearchQuery(e.target.value)}
+          placeholder="Search by customer, invoice number, P.O. number or GSTIN"
+        />
+        <Button type="submit" variant="outline">Search</Button>
+      </form>
+
       {invoices.length === 0 ? (
         <Card>
           <CardContent className="text-center py-8">
@@ -1126,6 +1154,13 @@ const InvoiceList = () => {
               </CardContent>
             </Card>
           ))}
+          {nextCursor && (
+            <div className="text-center">
+              <Button variant="outline" onClick={() => fetchInvoices(nextCursor)}>
+                Load More
+              </Button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+import os
+import re
+import sys
+from datetime import datetime, timezone
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv('/app/backend/.env')
+
+SAMPLE_ID = "00000000-0000-0000-0000-000000000000"
+SAMPLE_DATE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+LIST_SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+# Lists filtered by date page on the date instead
+DATE_LIST_SORT = [("invoice_date", DESCENDING), ("id", DESCENDING)]
+
+SAMPLE_COMPANY = "default"
+
+# (route, collection, filter, sort, limit, collscan_allowed)
+# Keep in sync with the query shapes issued by backend/server.py; every
+# tenant-facing query leads with company_id
+ROUTE_QUERIES = [
+    ("GET /api/company", "company_details", {"company_id": SAMPLE_COMPANY}, None, 1, False),
+    ("GET /api/invoices", "invoices", {"company_id": SAMPLE_COMPANY}, LIST_SORT, 51, False),
+    ("GET /api/invoices?cursor=", "invoices", {"company_id": SAMPLE_COMPANY, "$or": [
+        {"created_at": {"$lt": SAMPLE_DATE}},
+        {"created_at": SAMPLE_DATE, "id": {"$lt": SAMPLE_ID}},
+    ]}, LIST_SORT, 51, False),
+    ("GET /api/invoices?customer=", "invoices", {
+        "company_id": SAMPLE_COMPANY, "customer.name": "Sample",
+    }, LIST_SORT, 51, False),
+    ("GET /api/invoices?date_from=&date_to=", "invoices", {
+        "company_id": SAMPLE_COMPANY, "invoice_date": {"$gte": SAMPLE_DATE, "$lte": SAMPLE_DATE},
+    }, DATE_LIST_SORT, 51, False),
+    ("GET /api/invoices?date_from=&date_to=&cursor=", "invoices", {
+        "company_id": SAMPLE_COMPANY, "invoice_date": {"$gte": SAMPLE_DATE, "$lte": SAMPLE_DATE}, "$or": [
+            {"invoice_date": {"$lt": SAMPLE_DATE}},
+            {"invoice_date": SAMPLE_DATE, "id": {"$lt": SAMPLE_ID}},
+        ],
+    }, DATE_LIST_SORT, 51, False),
+    ("GET /api/invoices?customer=&date_from=", "invoices", {
+        "company_id": SAMPLE_COMPANY, "customer.name": "Sample", "invoice_date": {"$gte": SAMPLE_DATE},
+    }, DATE_LIST_SORT, 51, False),
+    ("GET /api/invoices/export?from=&to=", "invoices", {
+        "company_id": SAMPLE_COMPANY, "invoice_date": {"$gte": SAMPLE_DATE, "$lte": SAMPLE_DATE},
+    }, [("invoice_date", ASCENDING)], 0, False),
+    ("GET /api/invoices/search?q= (number prefix)", "invoices", {
+        "company_id": SAMPLE_COMPANY, "invoice_number": {"$in": [re.compile("^INV-0001")]},
+    }, [("invoice_number", ASCENDING)], 21, False),
+    ("GET /api/invoices/search?q= (GSTIN prefix)", "invoices", {
+        "company_id": SAMPLE_COMPANY, "customer.gstin": {"$in": [re.compile("^29ABCDE")]},
+    }, [("customer.gstin", ASCENDING)], 21, False),
+    ("GET /api/invoices/search?q= (text)", "invoices", {
+        "company_id": SAMPLE_COMPANY, "$text": {"$search": "Sample"},
+    }, None, 21, False),
+    ("GET /api/invoices/{id}", "invoices", {"id": SAMPLE_ID, "company_id": SAMPLE_COMPANY}, None, 1, False),
+    ("PUT /api/invoices/{id}", "invoices", {"id": SAMPLE_ID, "company_id": SAMPLE_COMPANY}, None, 1, False),
+    ("DELETE /api/invoices/{id}", "invoices", {"id": SAMPLE_ID, "company_id": SAMPLE_COMPANY}, None, 1, False),
+    ("GET /api/recurring-templates", "recurring_templates", {
+        "company_id": SAMPLE_COMPANY,
+    }, [("created_at", DESCENDING)], 1000, False),
+    ("recurring scheduler (due templates)", "recurring_templates", {
+        "active": True, "next_run_at": {"$lte": SAMPLE_DATE},
+    }, None, 0, False),
+    ("recurring scheduler (billed periods)", "invoices", {
+        "recurring_template_id": {"$in": [SAMPLE_ID]}, "recurring_period": {"$in": ["2026-01"]},
+    }, None, 0, False),
+    ("GET /api/jobs/{id}", "jobs", {"id": SAMPLE_ID, "company_id": SAMPLE_COMPANY}, None, 1, False),
+    ("job queue claim", "jobs", {"$or": [
+        {"status": "queued"},
+        {"status": "running", "lease_expires_at": {"$lt": SAMPLE_DATE}},
+    ]}, [("created_at", ASCENDING)], 1, False),
+    ("GET /api/reports/summary", "invoice_rollups", {
+        "company_id": SAMPLE_COMPANY, "dimension": "customer", "month": {"$gte": "2026-01", "$lte": "2026-12"},
+    }, [("month", ASCENDING), ("key", ASCENDING)], 0, False),
+]
+
+def plan_stages(plan):
+    """Yield every stage name in a winning plan tree"""
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for key in ('inputStage', 'queryPlan'):
+            if key in plan:
+                yield from plan_stages(plan[key])
+        for child in plan.get('inputStages', []):
+            yield from plan_stages(child)
+
+def advise_indexes():
+    """Explain each route's query and flag collection scans"""
+    try:
+        mongo_url = os.environ['MONGO_URL']
+        db_name = os.environ['DB_NAME']
+
+        client = MongoClient(mongo_url)
+        db = client[db_name]
+
+        print("🔎 Explaining route queries...")
+
+        problems = 0
+        for route, collection, query, sort, limit, collscan_allowed in ROUTE_QUERIES:
+            cursor = db[collection].find(query).limit(limit)
+            if sort:
+                cursor = cursor.sort(sort)
+            winning_plan = cursor.explain()['queryPlanner']['winningPlan']
+            stages = list(plan_stages(winning_plan))
+
+            if 'COLLSCAN' in stages and not collscan_allowed:
+                problems += 1
+                print(f"❌ {route}: COLLSCAN on {collection} ({' <- '.join(stages)})")
+            elif 'SORT' in stages:
+                problems += 1
+                print(f"⚠️  {route}: in-memory SORT on {collection} ({' <- '.join(stages)})")
+            else:
+                print(f"✅ {route}: {' <- '.join(stages)}")
+
+        client.close()
+
+        if problems:
+            print(f"❌ {problems} route queries are not served by an index")
+            sys.exit(1)
+        print("✅ All route queries use an index")
+
+    except Exception as e:
+        print(f"❌ Error explaining queries: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    advise_indexes()
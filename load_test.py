@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""Async load test for the invoice API
+
+Drives a weighted mix of create/list/get/update/delete requests from many
+concurrent workers and prints a JSON report with per-scenario latency
+percentiles, throughput and error rates, e.g.
+
+    python load_test.py --base-url http://localhost:8001 --concurrency 32 --duration 30
+    python load_test.py --in-process --mix get=10,list=4,create=2,update=2,delete=1
+    python load_test.py --output run.json --baseline last_build.json
+
+--in-process runs backend/server.py inside this process over ASGI instead of
+going through a socket; add --in-memory to swap MongoDB for mongomock-motor
+when no mongod is available (numbers are then only useful for comparing
+application overhead between builds).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+
+ROOT_DIR = Path(__file__).parent
+SCENARIOS = ["create", "list", "get", "update", "delete"]
+DEFAULT_MIX = "create=2,list=4,get=10,update=2,delete=1"
+
+
+def invoice_payload(rng):
+    line_items = []
+    for i in range(rng.randint(1, 20)):
+        quantity = rng.randint(1, 10)
+        rate = round(rng.uniform(100, 50000), 2)
+        line_items.append({
+            "description": f"Load test item {i + 1}",
+            "hsn_sac": "998314",
+            "quantity": quantity,
+            "rate": rate,
+            "amount": round(quantity * rate, 2),
+        })
+    return {
+        "due_date": (datetime.now(timezone.utc) + timedelta(days=30)).isoformat(),
+        "place_of_supply": rng.choice(["Karnataka", "Maharashtra", "Tamil Nadu", "Delhi"]),
+        "customer": {
+            "name": f"Load Customer {rng.randint(1, 500)}",
+            "address_line1": "1 Test Street",
+            "city": "Bengaluru",
+            "state": "Karnataka",
+            "zip_code": "560001",
+            "gstin": f"29LOADT{rng.randint(0, 9999):04d}F1Z5",
+        },
+        "line_items": line_items,
+        "service_charges": {"description": "Service charge", "amount": round(rng.uniform(500, 20000), 2)},
+    }
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}; expected one of {SCENARIOS}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LoadTest:
+    def __init__(self, client, weights, duration, concurrency, seed):
+        self.client = client
+        self.weights = weights
+        self.duration = duration
+        self.concurrency = concurrency
+        self.rng = random.Random(seed)
+        self.invoice_ids = []
+        # scenario -> list of (latency seconds, status code or None on exception)
+        self.samples = {name: [] for name in SCENARIOS}
+
+    async def call(self, scenario, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, None
+        self.samples[scenario].append((time.perf_counter() - started, status))
+        return response
+
+    async def create(self):
+        response = await self.call("create", "POST", "/api/invoices", json=invoice_payload(self.rng))
+        if response is not None and response.status_code == 200:
+            self.invoice_ids.append(response.json()["id"])
+
+    async def run_scenario(self, scenario):
+        if scenario != "create" and scenario != "list" and not self.invoice_ids:
+            scenario = "create"
+        if scenario == "create":
+            await self.create()
+        elif scenario == "list":
+            await self.call("list", "GET", "/api/invoices", params={"limit": 50, "view": "summary"})
+        elif scenario == "get":
+            await self.call("get", "GET", f"/api/invoices/{self.rng.choice(self.invoice_ids)}")
+        elif scenario == "update":
+            invoice_id = self.rng.choice(self.invoice_ids)
+            await self.call("update", "PUT", f"/api/invoices/{invoice_id}",
+                            json={"notes": f"Load test update {time.time()}"})
+        elif scenario == "delete":
+            invoice_id = self.invoice_ids.pop(self.rng.randrange(len(self.invoice_ids)))
+            await self.call("delete", "DELETE", f"/api/invoices/{invoice_id}")
+
+    async def worker(self, deadline):
+        names = list(self.weights)
+        weights = [self.weights[name] for name in names]
+        while time.perf_counter() < deadline:
+            await self.run_scenario(self.rng.choices(names, weights)[0])
+
+    async def run(self, seed_invoices):
+        for _ in range(seed_invoices):
+            await self.create()
+        # Seeding is setup, not part of the measurement
+        self.samples = {name: [] for name in SCENARIOS}
+
+        started = time.perf_counter()
+        deadline = started + self.duration
+        await asyncio.gather(*(self.worker(deadline) for _ in range(self.concurrency)))
+        return time.perf_counter() - started
+
+    def report(self, elapsed):
+        def summarize(samples):
+            latencies = sorted(latency * 1000 for latency, _ in samples)
+            errors = sum(1 for _, status in samples if status is None or status >= 400)
+            return {
+                "requests": len(samples),
+                "errors": errors,
+                "error_rate": errors / len(samples) if samples else 0.0,
+                "throughput_rps": len(samples) / elapsed if elapsed else 0.0,
+                "latency_ms": {
+                    "mean": sum(latencies) / len(latencies) if latencies else None,
+                    "p50": percentile(latencies, 50),
+                    "p95": percentile(latencies, 95),
+                    "p99": percentile(latencies, 99),
+                    "max": latencies[-1] if latencies else None,
+                },
+            }
+
+        all_samples = [sample for samples in self.samples.values() for sample in samples]
+        return {
+            "overall": summarize(all_samples),
+            "scenarios": {name: summarize(samples) for name, samples in self.samples.items() if samples},
+        }
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_with_baseline(report, baseline, tolerance):
+    """Return human-readable regressions of p99 latency or throughput"""
+    regressions = []
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("results", {}).get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        old_p99, new_p99 = previous["latency_ms"]["p99"], current["latency_ms"]["p99"]
+        if old_p99 and new_p99 and new_p99 > old_p99 * (1 + tolerance):
+            regressions.append(f"{name}: p99 {old_p99:.1f}ms -> {new_p99:.1f}ms")
+        old_rps, new_rps = previous["throughput_rps"], current["throughput_rps"]
+        if old_rps and new_rps < old_rps * (1 - tolerance):
+            regressions.append(f"{name}: throughput {old_rps:.1f} -> {new_rps:.1f} req/s")
+    return regressions
+
+def in_process_transport(in_memory):
+    sys.path.insert(0, str(ROOT_DIR / 'backend'))
+    import server
+
+    if in_memory:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("--in-memory needs mongomock-motor: pip install -r backend/requirements.txt")
+        # tz_aware like the real client, so stored datetimes compare the same way
+        server.client = AsyncMongoMockClient(tz_aware=True)
+        server.db = server.client["load_test"]
+    return httpx.ASGITransport(app=server.app), server
+
+async def main(args):
+    lifespan = contextlib.nullcontext()
+    if args.in_process:
+        transport, server = in_process_transport(args.in_memory)
+        client = httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=args.timeout)
+        if args.in_memory:
+            await server.ensure_indexes()
+        else:
+            # ASGITransport doesn't run lifespan events; open the Mongo pool ourselves
+            lifespan = server.app.router.lifespan_context(server.app)
+    else:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits)
+
+    async with lifespan, client:
+        test = LoadTest(client, args.mix, args.duration, args.concurrency, args.seed)
+        print(f"Running {args.duration}s at concurrency {args.concurrency}...", file=sys.stderr)
+        elapsed = await test.run(args.seed_invoices)
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "config": {
+            "target": "in-process" if args.in_process else args.base_url,
+            "in_memory": args.in_memory,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "mix": args.mix,
+            "seed_invoices": args.seed_invoices,
+        },
+        "elapsed_s": elapsed,
+        "results": test.report(elapsed),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare_with_baseline(report["results"], baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Async load test for the invoice API")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--in-process", action="store_true", help="serve backend/server.py over ASGI in this process")
+    parser.add_argument("--in-memory", action="store_true", help="with --in-process, use mongomock-motor instead of MongoDB")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of measured load")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"weighted scenario mix (default {DEFAULT_MIX})")
+    parser.add_argument("--seed-invoices", type=int, default=100, help="invoices created before measuring")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for payloads and scenario choice")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", help="earlier JSON report to compare p99 and throughput against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed regression vs --baseline (0.10 = 10%%)")
+    args = parser.parse_args()
+    if args.in_memory and not args.in_process:
+        parser.error("--in-memory requires --in-process")
+    asyncio.run(main(args))
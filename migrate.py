@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""Versioned, resumable schema migrations for stored invoices
+
+    python migrate.py              # apply every pending migration
+    python migrate.py --status     # documents left per migration
+    python migrate.py --to 1 --batch-size 2000 --concurrency 8
+
+Each migration streams the documents whose schema_version is below its own
+version (missing counts as 0) in _id order, transforms them in Python and
+writes the changes back with unordered bulk_write batches, several in
+flight at once. Every write also stamps schema_version and is guarded on the
+values it read, so re-running is harmless and edits made by the app while a
+migration runs are never overwritten; those documents are picked up again on
+the next pass. Progress is checkpointed in maintenance_checkpoints.
+
+New invoices are stamped with the latest version by the API
+(INVOICE_SCHEMA_VERSION in backend/server.py); keep the two in step.
+Migration 2 assigns pre-tenancy documents to the default company; the API
+cannot see them until it runs, so run it as part of deploying multi-company
+support, then run rebuild_rollups.py so rollups are keyed by company.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv('/app/backend/.env')
+
+DEFAULT_COMPANY_ID = os.environ.get('DEFAULT_COMPANY_ID', "default")
+BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', 1000))
+CONCURRENCY = int(os.environ.get('MIGRATION_CONCURRENCY', 4))
+# Extra passes over documents skipped because the app edited them mid-batch
+MAX_PASSES = 3
+
+
+class Migration:
+    """One schema step: `transform(doc)` returns the fields to $set, or None"""
+
+    def __init__(self, version, description, collection, transform, fields=None, prepare=None):
+        self.version = version
+        self.description = description
+        self.collection = collection
+        self.transform = transform
+        # Fields the transform reads; None fetches whole documents
+        self.fields = fields
+        # Optional prepare(db), run once before the first pass
+        self.prepare = prepare
+
+    def pending_filter(self):
+        # $not/$gte also matches documents with no schema_version at all
+        return {"schema_version": {"$not": {"$gte": self.version}}}
+
+    def projection(self):
+        if self.fields is None:
+            return None
+        return {field: 1 for field in [*self.fields, "schema_version", "version"]}
+
+
+# 1: ISO string dates -> native BSON datetimes (formerly migrate_invoice_dates.py)
+DATE_FIELDS = ['invoice_date', 'due_date', 'created_at', 'updated_at']
+
+def parse_iso(value):
+    """Parse an ISO string as written by the old prepare_for_mongo"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def convert_invoice_dates(doc):
+    updates = {}
+    for field in DATE_FIELDS:
+        value = doc.get(field)
+        if isinstance(value, str):
+            try:
+                updates[field] = parse_iso(value)
+            except ValueError:
+                print(f"⚠️  Skipping unparseable {field}={value!r} on {doc['_id']}")
+    return updates
+
+
+# 2: documents written before multi-company support belong to the default company
+# (until this runs the API warns at startup; see check_tenant_migration)
+def assign_default_company(doc):
+    if not doc.get("company_id"):
+        return {"company_id": DEFAULT_COMPANY_ID}
+    return None
+
+def retire_conflicting_company_details(db):
+    """Keep a pre-tenancy company record out of the default company's way
+
+    If the default company already saved details through the API, those win;
+    the old record is kept under an id no request can select instead of
+    colliding with company_id_unique.
+    """
+    if db.company_details.find_one({"company_id": DEFAULT_COMPANY_ID}, {"_id": 1}) is None:
+        return
+    for legacy in db.company_details.find({"company_id": {"$exists": False}}, {"_id": 1}):
+        db.company_details.update_one(
+            {"_id": legacy["_id"]}, {"$set": {"company_id": f"superseded:{legacy['_id']}"}}
+        )
+        print(f"⚠️  Company details {legacy['_id']} superseded by the default company's current record")
+
+
+MIGRATIONS = [
+    Migration(1, "Store invoice dates as BSON datetimes", "invoices", convert_invoice_dates, DATE_FIELDS),
+    Migration(1, "Store archived invoice dates as BSON datetimes", "invoices_archive",
+              convert_invoice_dates, DATE_FIELDS),
+    Migration(2, "Assign invoices to the default company", "invoices", assign_default_company, ["company_id"]),
+    Migration(2, "Assign archived invoices to the default company", "invoices_archive",
+              assign_default_company, ["company_id"]),
+    Migration(2, "Assign company details to the default company", "company_details",
+              assign_default_company, ["company_id"], prepare=retire_conflicting_company_details),
+    Migration(2, "Assign recurring templates to the default company", "recurring_templates",
+              assign_default_company, ["company_id"]),
+]
+
+
+def migrate_batch(collection, migration, batch):
+    """Transform and write one batch; returns (migrated, conflicts)"""
+    operations = []
+    for doc in batch:
+        updates = migration.transform(doc) or {}
+        # Guard on what was read: schema_version keeps reruns idempotent and
+        # version makes an app edit since the read skip this document
+        guard = {
+            "_id": doc["_id"],
+            "schema_version": doc.get("schema_version"),
+            "version": doc.get("version"),
+        }
+        for field in updates:
+            guard[field] = doc.get(field)
+        operations.append(UpdateOne(guard, {"$set": {**updates, "schema_version": migration.version}}))
+    result = collection.bulk_write(operations, ordered=False)
+    return result.modified_count, len(operations) - result.matched_count
+
+def run_pass(db, migration, start_after, batch_size, concurrency):
+    """Stream pending documents once; returns (migrated, conflicts)"""
+    collection = db[migration.collection]
+    checkpoint_id = f"migration:{migration.collection}:{migration.version}"
+    query = migration.pending_filter()
+    if start_after is not None:
+        query = {"$and": [query, {"_id": {"$gt": start_after}}]}
+
+    migrated = conflicts = 0
+    started = time.monotonic()
+    # (future, last _id of its batch), oldest first
+    in_flight = deque()
+
+    def settle_oldest():
+        nonlocal migrated, conflicts
+        future, last_id = in_flight.popleft()
+        done, skipped = future.result()
+        migrated += done
+        conflicts += skipped
+        # Batches finish out of order; only checkpoint past completed prefixes
+        db.maintenance_checkpoints.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"last_id": last_id, "updated_at": datetime.now(timezone.utc)}, "$inc": {"migrated": done}},
+            upsert=True
+        )
+        print(f"   ...{migrated} documents migrated ({time.monotonic() - started:.1f}s)")
+
+    cursor = collection.find(query, migration.projection()).sort("_id", 1).batch_size(batch_size)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        batch = []
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) == batch_size:
+                in_flight.append((pool.submit(migrate_batch, collection, migration, batch), batch[-1]["_id"]))
+                batch = []
+                # Bound memory: at most two batches queued per worker
+                while len(in_flight) >= concurrency * 2:
+                    settle_oldest()
+        if batch:
+            in_flight.append((pool.submit(migrate_batch, collection, migration, batch), batch[-1]["_id"]))
+        while in_flight:
+            settle_oldest()
+    return migrated, conflicts
+
+def apply_migration(db, migration, batch_size, concurrency):
+    """Run one migration to completion, resuming from its checkpoint"""
+    checkpoint_id = f"migration:{migration.collection}:{migration.version}"
+    checkpoint = db.maintenance_checkpoints.find_one({"_id": checkpoint_id}) or {}
+    if checkpoint.get("completed_at"):
+        return
+
+    print(f"🔧 Migration {migration.version}: {migration.description}...")
+    if migration.prepare is not None:
+        migration.prepare(db)
+    start_after = checkpoint.get("last_id")
+    if start_after is not None:
+        print(f"   resuming after _id {start_after}")
+
+    collection = db[migration.collection]
+    for _ in range(MAX_PASSES):
+        migrated, conflicts = run_pass(db, migration, start_after, batch_size, concurrency)
+        if conflicts:
+            print(f"⚠️  {conflicts} documents changed while migrating; another pass will retry them")
+        elif start_after is None or not collection.count_documents(migration.pending_filter(), limit=1):
+            break
+        # Skipped documents, or ones an earlier run left unfinished, sit
+        # behind the checkpoint, so rescan from the start
+        start_after = None
+
+    remaining = collection.count_documents(migration.pending_filter())
+    if remaining:
+        # The next run must look behind the checkpoint too, or it never will
+        db.maintenance_checkpoints.update_one({"_id": checkpoint_id}, {"$unset": {"last_id": ""}})
+        raise RuntimeError(f"migration {migration.version} left {remaining} documents behind; run again")
+    db.maintenance_checkpoints.update_one(
+        {"_id": checkpoint_id}, {"$set": {"completed_at": datetime.now(timezone.utc)}}, upsert=True
+    )
+    print(f"✅ Migration {migration.version} complete")
+
+def migrate(target, batch_size, concurrency, status_only):
+    """Apply pending migrations up to `target` in version order"""
+    try:
+        mongo_url = os.environ['MONGO_URL']
+        db_name = os.environ['DB_NAME']
+
+        client = MongoClient(mongo_url, tz_aware=True, maxPoolSize=concurrency + 2)
+        db = client[db_name]
+
+        for migration in MIGRATIONS:
+            if target is not None and migration.version > target:
+                break
+            if status_only:
+                remaining = db[migration.collection].count_documents(migration.pending_filter())
+                print(f"{'✅' if not remaining else '⏳'} {migration.version}: {migration.description} "
+                      f"({remaining} documents pending)")
+            else:
+                apply_migration(db, migration, batch_size, concurrency)
+
+        client.close()
+
+    except Exception as e:
+        print(f"❌ Error migrating: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument("--to", type=int, help="stop after this migration version")
+    parser.add_argument("--status", action="store_true", help="report pending documents without migrating")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="batches written in parallel")
+    args = parser.parse_args()
+    migrate(args.to, args.batch_size, args.concurrency, args.status)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv('/app/backend/.env')
+
+FINANCIAL_YEAR_TZ = os.environ.get('FINANCIAL_YEAR_TZ', "Asia/Kolkata")
+ROLLUP_FIELDS = ['subtotal', 'service_charge', 'total_cgst', 'total_sgst', 'total_gst', 'grand_total']
+
+# Must produce the same documents as rollup_contributions() in backend/server.py.
+# Invoices moved to invoices_archive by archive_invoices.py still count.
+SOURCE_COLLECTIONS = ["invoices", "invoices_archive"]
+REBUILD_PIPELINE = [
+    {"$unionWith": {"coll": "invoices_archive"}},
+    {"$project": {
+        "company_id": 1,
+        "month": {"$dateToString": {"format": "%Y-%m", "date": "$invoice_date",
+                                    "timezone": FINANCIAL_YEAR_TZ}},
+        "totals": 1,
+        "keys": [
+            {"dimension": "all", "key": ""},
+            {"dimension": "customer", "key": "$customer.name"},
+            {"dimension": "place_of_supply", "key": "$place_of_supply"},
+        ],
+    }},
+    {"$unwind": "$keys"},
+    {"$group": {
+        "_id": {"$concat": ["$company_id", "|", "$month", "|", "$keys.dimension", "|", "$keys.key"]},
+        "company_id": {"$first": "$company_id"},
+        "month": {"$first": "$month"},
+        "dimension": {"$first": "$keys.dimension"},
+        "key": {"$first": "$keys.key"},
+        "invoice_count": {"$sum": 1},
+        **{field: {"$sum": f"$totals.{field}"} for field in ROLLUP_FIELDS},
+    }},
+    # $out swaps the collection in atomically and keeps its indexes
+    {"$out": "invoice_rollups"},
+]
+
+def rebuild_rollups():
+    """Recompute the invoice_rollups collection from scratch"""
+    try:
+        mongo_url = os.environ['MONGO_URL']
+        db_name = os.environ['DB_NAME']
+
+        client = MongoClient(mongo_url)
+        db = client[db_name]
+
+        for collection in SOURCE_COLLECTIONS:
+            string_dated = db[collection].count_documents({"invoice_date": {"$type": "string"}})
+            if string_dated:
+                print(f"❌ {string_dated} documents in {collection} still have string dates; run migrate.py first")
+                sys.exit(1)
+            untenanted = db[collection].count_documents({"company_id": {"$exists": False}})
+            if untenanted:
+                print(f"❌ {untenanted} documents in {collection} have no company_id; run migrate.py first")
+                sys.exit(1)
+
+        print("📊 Rebuilding invoice rollups...")
+        started = time.monotonic()
+        db.invoices.aggregate(REBUILD_PIPELINE, allowDiskUse=True)
+
+        count = db.invoice_rollups.count_documents({})
+        client.close()
+        print(f"✅ Rebuilt {count} rollup documents in {time.monotonic() - started:.1f}s")
+
+    except Exception as e:
+        print(f"❌ Error rebuilding rollups: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    rebuild_rollups()
@@ -0,0 +1,48 @@
+import asyncio
+
+import server
+
+
+def test_batch_reports_each_item(api, create_invoice, invoice_payload):
+    # The unique index turns a clash with a stored number into a per-item error
+    asyncio.run(server.ensure_indexes())
+    create_invoice(number="TAKEN")
+
+    response = api.post("/api/invoices/bulk", params={"chunk_size": 2}, json=[
+        invoice_payload(number="A-1"),
+        {"invoice_number": "broken"},
+        invoice_payload(number="A-1"),
+        invoice_payload(number="TAKEN"),
+        invoice_payload(number="A-2"),
+    ])
+
+    body = response.json()
+    assert response.status_code == 200
+    assert (body["created"], body["failed"]) == (2, 3)
+    assert [(result["index"], result["status"]) for result in body["results"]] == [
+        (0, "created"), (1, "error"), (2, "error"), (3, "error"), (4, "created"),
+    ]
+    assert body["results"][2]["error"] == "Duplicate invoice number within batch"
+    assert body["results"][3]["error"] == "Invoice number already exists"
+
+
+def test_oversized_batch_is_rejected_before_any_work(api, invoice_payload, mock_db, monkeypatch):
+    monkeypatch.setattr(server, "BULK_MAX_INVOICES", 2)
+
+    response = api.post("/api/invoices/bulk", json=[invoice_payload(number=None)] * 3)
+
+    assert response.status_code == 413
+    assert response.json()["detail"] == "At most 2 invoices per request; got 3"
+    assert api.get("/api/invoices").json()["items"] == []
+
+
+def test_number_allocation_failure_is_a_clean_500(api, invoice_payload, monkeypatch):
+    async def unavailable(company_id, count, moment=None):
+        raise RuntimeError("counters unavailable")
+
+    monkeypatch.setattr(server, "allocate_invoice_numbers", unavailable)
+
+    response = api.post("/api/invoices/bulk", json=[invoice_payload(number=None)])
+
+    assert response.status_code == 500
+    assert response.json()["detail"] == "counters unavailable"
@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from server import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 31, 23, 59, 59, 123000, tzinfo=timezone.utc)
+    invoice_id = "3f6d2b1e-8c1a-4f0e-9b7d-2a5c4e6f8a90"
+
+    assert decode_cursor(encode_cursor(created_at, invoice_id)) == (created_at, invoice_id)
+
+
+def test_cursor_treats_naive_datetimes_as_utc():
+    created_at = datetime(2026, 1, 1, 12, 0)
+
+    decoded, _ = decode_cursor(encode_cursor(created_at, "x"))
+
+    assert decoded == created_at.replace(tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "WzEsMl0", "bnVsbA"])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(cursor)
+    assert excinfo.value.status_code == 400
+
+
+def walk(api, **params):
+    """Follow next_cursor to the end; returns every page's items in order"""
+    items, cursor = [], None
+    while True:
+        page = api.get("/api/invoices", params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        items.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def test_pages_cover_every_invoice_once_newest_first(api, create_invoice, mock_db):
+    created = [create_invoice(number=f"INV-{n:03d}") for n in range(7)]
+    # Ties on created_at must still page deterministically, by id
+    asyncio.run(mock_db.invoices.update_many({}, {"$set": {"created_at": datetime(2026, 10, 1, tzinfo=timezone.utc)}}))
+
+    items = walk(api, limit=3)
+
+    assert sorted(item["id"] for item in items) == sorted(invoice["id"] for invoice in created)
+    assert [item["id"] for item in items] == sorted((item["id"] for item in items), reverse=True)
+
+
+def test_sparse_pages_still_carry_a_cursor(api, create_invoice):
+    for n in range(3):
+        create_invoice(number=f"INV-{n:03d}")
+
+    page = api.get("/api/invoices", params={"limit": 2, "fields": "invoice_number"}).json()
+
+    assert [set(item) for item in page["items"]] == [{"invoice_number"}, {"invoice_number"}]
+    assert page["next_cursor"]
+    assert len(walk(api, limit=2, fields="invoice_number")) == 3
+
+
+def test_date_range_pages_by_invoice_date(api, create_invoice, mock_db):
+    created = [create_invoice(number=f"INV-{n:03d}") for n in range(6)]
+
+    async def backdate():
+        # Entered in one order, dated in another
+        for day, invoice in zip([5, 1, 4, 2, 6, 3], created):
+            await mock_db.invoices.update_one(
+                {"id": invoice["id"]}, {"$set": {"invoice_date": datetime(2026, 9, day, tzinfo=timezone.utc)}}
+            )
+    asyncio.run(backdate())
+
+    items = walk(api, limit=2, date_from="2026-09-02T00:00:00Z", date_to="2026-09-05T00:00:00Z",
+                 fields="invoice_number")
+
+    assert [item["invoice_number"] for item in items] == ["INV-000", "INV-002", "INV-005", "INV-003"]
@@ -0,0 +1,61 @@
+import pytest
+
+COMPANY = {
+    "company_name": "Acme Pvt Ltd", "address_line1": "1 MG Road", "city": "Bengaluru", "state": "Karnataka",
+    "zip_code": "560001", "phone": "080 1234 5678", "email": "billing@acme.test", "gstin": "29ABCDE1234F1Z5",
+    "bank_name": "State Bank", "account_number": "1234567890", "ifsc_code": "SBIN0000001",
+    "branch": "MG Road", "branch_code": "00001",
+}
+
+
+def test_invoice_revalidates_with_304_until_it_changes(api, create_invoice):
+    invoice = create_invoice()
+    url = f"/api/invoices/{invoice['id']}"
+
+    first = api.get(url)
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+    assert "X-Company-Id" in first.headers["Vary"]
+
+    cached = api.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b""
+    assert cached.headers["ETag"] == etag
+
+    assert api.put(url, json={"notes": "changed"}).status_code == 200
+    changed = api.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag and changed.json()["notes"] == "changed"
+
+
+@pytest.mark.parametrize("header", ["W/{etag}", '"other", {etag}', "*"])
+def test_if_none_match_forms(api, create_invoice, header):
+    invoice = create_invoice()
+    url = f"/api/invoices/{invoice['id']}"
+    etag = api.get(url).headers["ETag"]
+
+    assert api.get(url, headers={"If-None-Match": header.format(etag=etag)}).status_code == 304
+
+
+def test_revalidating_another_companys_invoice_is_404(api, create_invoice):
+    invoice = create_invoice()
+    url = f"/api/invoices/{invoice['id']}"
+    etag = api.get(url).headers["ETag"]
+
+    response = api.get(url, headers={"If-None-Match": etag, "X-Company-Id": "acme"})
+    assert response.status_code == 404
+
+
+def test_company_details_etag_follows_version_and_company(api):
+    assert api.post("/api/company", json=COMPANY).status_code == 200
+    first = api.get("/api/company")
+    etag = first.headers["ETag"]
+    assert etag == '"company-default-1"'
+
+    assert api.get("/api/company", headers={"If-None-Match": etag}).status_code == 304
+    # Same ETag value from another company must not match its record
+    assert api.post("/api/company", json=COMPANY, headers={"X-Company-Id": "acme"}).status_code == 200
+    other = api.get("/api/company", headers={"If-None-Match": etag, "X-Company-Id": "acme"})
+    assert other.status_code == 200 and other.headers["ETag"] == '"company-acme-1"'
+
+    assert api.post("/api/company", json={**COMPANY, "phone": "080 0000 0000"}).status_code == 200
+    assert api.get("/api/company", headers={"If-None-Match": etag}).status_code == 200
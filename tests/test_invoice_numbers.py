@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("moment, fy", [
+    (datetime(2026, 3, 31, 18, 29, tzinfo=timezone.utc), "2025-26"),
+    # Midnight on 1 April in the invoicing time zone starts the new year
+    (datetime(2026, 3, 31, 18, 30, tzinfo=timezone.utc), "2026-27"),
+    (datetime(2099, 12, 31, tzinfo=timezone.utc), "2099-00"),
+])
+def test_financial_year_boundary(moment, fy):
+    assert server.financial_year(moment) == fy
+
+
+def test_concurrent_allocations_are_unique_and_gap_free(mock_db):
+    moment = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+    async def scenario():
+        return await asyncio.gather(*(server.allocate_invoice_numbers("default", 3, moment) for _ in range(10)))
+
+    blocks = asyncio.run(scenario())
+    numbers = [number for block in blocks for number in block]
+    assert sorted(numbers) == [f"INV/2026-27/{seq:06d}" for seq in range(1, 31)]
+    # Each block is consecutive
+    for block in blocks:
+        first = int(block[0].rsplit("/", 1)[1])
+        assert block == [f"INV/2026-27/{seq:06d}" for seq in range(first, first + 3)]
+
+
+def test_each_company_and_year_has_its_own_sequence(mock_db):
+    october, april = datetime(2026, 10, 1, tzinfo=timezone.utc), datetime(2027, 4, 1, tzinfo=timezone.utc)
+
+    async def scenario():
+        return [
+            await server.allocate_invoice_numbers("default", 2, october),
+            await server.allocate_invoice_numbers("acme", 1, october),
+            await server.allocate_invoice_numbers("default", 1, april),
+            await server.allocate_invoice_numbers("default", 0, october),
+        ], await mock_db.counters.find({}, {"seq": 1}).sort("_id", 1).to_list(None)
+
+    allocated, counters = asyncio.run(scenario())
+
+    assert allocated == [["INV/2026-27/000001", "INV/2026-27/000002"], ["INV/2026-27/000001"],
+                         ["INV/2027-28/000001"], []]
+    # The default company keeps the pre-tenancy counter ids
+    assert counters == [
+        {"_id": "invoice_number:2026-27", "seq": 2},
+        {"_id": "invoice_number:2027-28", "seq": 1},
+        {"_id": "invoice_number:acme:2026-27", "seq": 1},
+    ]
+
+
+def test_api_numbers_invoices_sent_without_one(api, create_invoice, invoice_payload):
+    fy = server.financial_year(datetime.now(timezone.utc))
+    single = create_invoice(number=None)
+
+    response = api.post("/api/invoices/bulk", json=[
+        invoice_payload(number=None), invoice_payload(number="MANUAL-1"), invoice_payload(number=None),
+    ])
+
+    assert single["invoice_number"] == f"INV/{fy}/000001"
+    numbers = [result["invoice_number"] for result in response.json()["results"]]
+    assert numbers == [f"INV/{fy}/000002", "MANUAL-1", f"INV/{fy}/000003"]
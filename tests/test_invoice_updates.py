@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+import server
+
+LINE_ITEMS = [{"description": "Audit", "hsn_sac": "998222", "quantity": 1, "rate": 3000, "amount": 3000}]
+
+
+def test_stale_version_is_rejected(api, create_invoice):
+    invoice = create_invoice()
+    first = api.put(f"/api/invoices/{invoice['id']}", json={"notes": "first", "version": invoice["version"]})
+    assert first.status_code == 200 and first.json()["version"] == invoice["version"] + 1
+
+    stale = api.put(f"/api/invoices/{invoice['id']}", json={"notes": "second", "version": invoice["version"]})
+    assert stale.status_code == 409
+    assert api.get(f"/api/invoices/{invoice['id']}").json()["notes"] == "first"
+
+
+def test_missing_invoice_is_404_not_409(api):
+    response = api.put("/api/invoices/nope", json={"notes": "x", "version": 0})
+    assert response.status_code == 404
+
+
+def test_partial_put_rereads_half_changed_concurrently(api, create_invoice, mock_db, monkeypatch):
+    invoice = create_invoice()
+    collection = type(mock_db.invoices)
+    find_one = collection.find_one
+    interleaved = []
+
+    async def find_one_then_concurrent_edit(self, *args, **kwargs):
+        stored = await find_one(self, *args, **kwargs)
+        if self.name == "invoices" and not interleaved:
+            # Someone else changes the service charge between our read and write
+            interleaved.append(True)
+            await mock_db.invoices.update_one(
+                {"id": invoice["id"]},
+                {"$set": {"service_charges.amount": 900.0}, "$inc": {"version": 1}},
+            )
+        return stored
+
+    with monkeypatch.context() as patch:
+        patch.setattr(collection, "find_one", find_one_then_concurrent_edit)
+        response = api.put(f"/api/invoices/{invoice['id']}", json={"line_items": LINE_ITEMS})
+
+    assert response.status_code == 200, response.text
+    updated = api.get(f"/api/invoices/{invoice['id']}").json()
+    # The concurrent service charge survives and the totals include it
+    assert updated["service_charges"]["amount"] == 900
+    assert updated["line_items"][0]["description"] == "Audit"
+    expected = server.calculate_totals_and_gst(
+        [server.LineItem(**item) for item in LINE_ITEMS], server.ServiceCharge(**updated["service_charges"])
+    )
+    assert updated["totals"] == pytest.approx(expected.dict())
+    assert updated["version"] == invoice["version"] + 2
+
+
+def test_partial_put_gives_up_with_409_under_constant_contention(api, create_invoice, mock_db, monkeypatch):
+    invoice = create_invoice()
+    collection = type(mock_db.invoices)
+    find_one = collection.find_one
+
+    async def find_one_then_concurrent_edit(self, *args, **kwargs):
+        stored = await find_one(self, *args, **kwargs)
+        if self.name == "invoices":
+            await mock_db.invoices.update_one({"id": invoice["id"]}, {"$inc": {"version": 1}})
+        return stored
+
+    with monkeypatch.context() as patch:
+        patch.setattr(collection, "find_one", find_one_then_concurrent_edit)
+        response = api.put(f"/api/invoices/{invoice['id']}", json={"line_items": LINE_ITEMS})
+
+    assert response.status_code == 409
+    unchanged = api.get(f"/api/invoices/{invoice['id']}").json()
+    assert unchanged["line_items"][0]["description"] == "Consulting"
+
+
+def test_responses_omit_internal_fields(api, create_invoice, mock_db):
+    invoice = create_invoice()
+    assert "schema_version" not in invoice
+    # Recurring invoices also carry their template and period
+    asyncio.run(mock_db.invoices.update_one(
+        {"id": invoice["id"]}, {"$set": {"recurring_template_id": "t1", "recurring_period": "2026-10"}}
+    ))
+
+    fetched = api.get(f"/api/invoices/{invoice['id']}").json()
+    listed = api.get("/api/invoices").json()["items"][0]
+    updated = api.put(f"/api/invoices/{invoice['id']}", json={"notes": "x"}).json()
+    for body in (fetched, listed, updated):
+        assert set(body) == set(server.Invoice.model_fields)
@@ -0,0 +1,128 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pydantic import BaseModel
+
+from jobs import JobQueue
+
+
+class Params(BaseModel):
+    value: int = 0
+
+
+def make_queue(collection, handler, **options):
+    queue = JobQueue(workers=1, **options)
+    queue.collection = collection
+    queue.handler("echo", Params)(handler)
+    return queue
+
+
+async def echo(params, job):
+    await job.progress(1, 1)
+    return {"value": params.value, "company_id": job.company_id}
+
+
+def test_job_runs_to_success_and_is_scoped_to_its_company(mock_db):
+    async def scenario():
+        queue = make_queue(mock_db.jobs, echo)
+        submitted = await queue.submit("echo", {"value": 7}, "acme")
+        await queue._run(await queue._claim())
+        return submitted, await queue.get(submitted["id"], "acme"), await queue.get(submitted["id"], "default")
+
+    submitted, job, other = asyncio.run(scenario())
+
+    assert submitted["status"] == "queued"
+    assert job["status"] == "succeeded" and job["attempts"] == 1
+    assert job["result"] == {"value": 7, "company_id": "acme"}
+    assert job["progress"] == {"done": 1, "total": 1}
+    assert "owner" not in job and "lease_expires_at" not in job
+    assert other is None
+
+
+def test_submit_rejects_unknown_types_and_bad_params(mock_db):
+    queue = make_queue(mock_db.jobs, echo)
+    with pytest.raises(ValueError, match="Unknown job type"):
+        asyncio.run(queue.submit("nope", {}, "default"))
+    with pytest.raises(ValueError):
+        asyncio.run(queue.submit("echo", {"value": "not a number"}, "default"))
+
+
+def test_expired_lease_is_reclaimed_and_the_old_owner_is_fenced_off(mock_db):
+    async def scenario():
+        crashed = make_queue(mock_db.jobs, echo)
+        survivor = make_queue(mock_db.jobs, echo)
+        submitted = await crashed.submit("echo", {"value": 1}, "default")
+        assert await crashed._claim()
+        # A live lease is left alone
+        assert await survivor._claim() is None
+
+        await mock_db.jobs.update_one(
+            {"id": submitted["id"]}, {"$set": {"lease_expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+        )
+        reclaimed = await survivor._claim()
+        # The first owner wakes up late; its writes no longer land
+        await crashed._update(submitted["id"], {"status": "failed", "error": "stale"})
+        await survivor._run(reclaimed)
+        return reclaimed, await survivor.get(submitted["id"], "default")
+
+    reclaimed, job = asyncio.run(scenario())
+
+    assert reclaimed["attempts"] == 2
+    assert job["status"] == "succeeded" and job["error"] is None
+
+
+def test_job_is_abandoned_after_max_attempts(mock_db):
+    async def scenario():
+        queue = make_queue(mock_db.jobs, echo, max_attempts=2)
+        submitted = await queue.submit("echo", {}, "default")
+        await mock_db.jobs.update_one({"id": submitted["id"]}, {"$set": {"attempts": 2}})
+        await queue._run(await queue._claim())
+        return await queue.get(submitted["id"], "default")
+
+    job = asyncio.run(scenario())
+
+    assert job["status"] == "failed"
+    assert job["error"] == "Abandoned after 2 attempts"
+
+
+def test_handler_error_fails_the_job(mock_db):
+    async def boom(params, job):
+        raise RuntimeError("disk full")
+
+    async def scenario():
+        queue = make_queue(mock_db.jobs, boom)
+        submitted = await queue.submit("echo", {}, "default")
+        await queue._run(await queue._claim())
+        return await queue.get(submitted["id"], "default")
+
+    job = asyncio.run(scenario())
+
+    assert job["status"] == "failed" and job["error"] == "disk full"
+    assert job["finished_at"]
+
+
+def test_shutdown_hands_a_running_job_back(mock_db):
+    started = asyncio.Event()
+
+    async def slow(params, job):
+        await job.progress(5, 10)
+        started.set()
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        queue = make_queue(mock_db.jobs, slow, progress_interval=0)
+        submitted = await queue.submit("echo", {}, "default")
+        run = asyncio.create_task(queue._run(await queue._claim()))
+        await started.wait()
+        run.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await run
+        return await mock_db.jobs.find_one({"id": submitted["id"]}, {"_id": 0})
+
+    job = asyncio.run(scenario())
+
+    assert job["status"] == "queued" and job["owner"] is None
+    # The interrupted attempt does not count towards max_attempts
+    assert job["attempts"] == 0
+    assert job["progress"] == {"done": 5, "total": 10}
@@ -0,0 +1,66 @@
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import migrate
+
+ASSIGN_INVOICES = next(m for m in migrate.MIGRATIONS if m.version == 2 and m.collection == "invoices")
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient(tz_aware=True)["test"]
+
+
+def seed(db, count):
+    db.invoices.insert_many([{"_id": f"{n:04d}", "invoice_number": f"INV-{n}", "version": 0} for n in range(count)])
+
+
+def test_fresh_run_migrates_everything_and_completes(db):
+    seed(db, 25)
+    migrate.apply_migration(db, ASSIGN_INVOICES, batch_size=4, concurrency=2)
+
+    assert db.invoices.count_documents({"company_id": migrate.DEFAULT_COMPANY_ID, "schema_version": 2}) == 25
+    checkpoint = db.maintenance_checkpoints.find_one({"_id": "migration:invoices:2"})
+    assert checkpoint["completed_at"] and checkpoint["last_id"] == "0024"
+
+
+def test_resume_revisits_documents_behind_the_checkpoint(db):
+    seed(db, 25)
+    # An earlier run checkpointed past 0010 but died before 0003 was written
+    db.invoices.update_many({"_id": {"$lte": "0010", "$ne": "0003"}},
+                            {"$set": {"company_id": migrate.DEFAULT_COMPANY_ID, "schema_version": 2}})
+    db.maintenance_checkpoints.insert_one({"_id": "migration:invoices:2", "last_id": "0010"})
+
+    migrate.apply_migration(db, ASSIGN_INVOICES, batch_size=4, concurrency=2)
+
+    assert db.invoices.count_documents(ASSIGN_INVOICES.pending_filter()) == 0
+    assert db.invoices.find_one({"_id": "0003"})["company_id"] == migrate.DEFAULT_COMPANY_ID
+    assert db.maintenance_checkpoints.find_one({"_id": "migration:invoices:2"})["completed_at"]
+
+
+def test_failed_run_clears_the_checkpoint_for_the_next(db, monkeypatch):
+    seed(db, 5)
+    db.maintenance_checkpoints.insert_one({"_id": "migration:invoices:2", "last_id": "0004"})
+    # Every write loses to an app edit, so documents are still pending at the end
+    monkeypatch.setattr(migrate, "migrate_batch", lambda collection, migration, batch: (0, len(batch)))
+
+    with pytest.raises(RuntimeError, match="left 5 documents behind"):
+        migrate.apply_migration(db, ASSIGN_INVOICES, batch_size=2, concurrency=1)
+    assert "last_id" not in db.maintenance_checkpoints.find_one({"_id": "migration:invoices:2"})
+
+    monkeypatch.undo()
+    migrate.apply_migration(db, ASSIGN_INVOICES, batch_size=2, concurrency=1)
+    assert db.invoices.count_documents(ASSIGN_INVOICES.pending_filter()) == 0
+
+
+def test_edit_made_mid_migration_is_kept(db):
+    seed(db, 1)
+    doc = db.invoices.find_one({"_id": "0000"}, ASSIGN_INVOICES.projection())
+    # The app bumps the version after the migration read the document
+    db.invoices.update_one({"_id": "0000"}, {"$set": {"notes": "edited"}, "$inc": {"version": 1}})
+
+    migrated, conflicts = migrate.migrate_batch(db.invoices, ASSIGN_INVOICES, [doc])
+
+    assert (migrated, conflicts) == (0, 1)
+    assert db.invoices.find_one({"_id": "0000"})["notes"] == "edited"
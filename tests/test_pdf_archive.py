@@ -0,0 +1,105 @@
+import asyncio
+import gc
+import io
+import zipfile
+
+import pytest
+
+import server
+
+
+async def fake_pdf(invoice, company):
+    await asyncio.sleep(0)
+    return f"%PDF {invoice['invoice_number']}".encode()
+
+
+def test_sanitised_name_clashes_get_distinct_entries(api, create_invoice, monkeypatch):
+    monkeypatch.setattr(server, "cached_invoice_pdf", fake_pdf)
+    first = create_invoice(number="INV/1")
+    second = create_invoice(number="INV_1")
+    create_invoice(number="INV-2")
+
+    response = api.post("/api/invoices/archive")
+
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    names = archive.namelist()
+    assert len(names) == len(set(names)) == 3
+    assert "INV-2.pdf" in names
+    # Whichever rendered second carries its id
+    clashing = [name for name in names if name.startswith("INV_1")]
+    assert "INV_1.pdf" in clashing
+    assert {f"INV_1-{first['id']}.pdf", f"INV_1-{second['id']}.pdf"} & set(clashing)
+    assert sorted(archive.read(name) for name in clashing) == [b"%PDF INV/1", b"%PDF INV_1"]
+
+
+def run_collecting_loop_errors(coroutine):
+    """Run a coroutine and return what the loop reported to its exception handler"""
+    errors = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context["message"]))
+        await coroutine
+        # Unretrieved task exceptions are reported when the task is collected
+        gc.collect()
+        await asyncio.sleep(0)
+    asyncio.run(main())
+    return errors
+
+
+def test_abort_cancels_and_collects_pending_renders(create_invoice, monkeypatch):
+    for n in range(6):
+        create_invoice(number=f"INV-{n}")
+    renders = []
+
+    async def slow_pdf(invoice, company):
+        renders.append(asyncio.current_task())
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(server, "cached_invoice_pdf", slow_pdf)
+    monkeypatch.setattr(server, "PDF_RENDER_WORKERS", 2)
+
+    async def client_disconnects():
+        stream = server.stream_invoice_pdf_zip({"company_id": server.DEFAULT_COMPANY_ID}, server.DEFAULT_COMPANY_ID)
+        consumer = asyncio.create_task(stream.__anext__())
+        await asyncio.sleep(0.01)
+        consumer.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await consumer
+        await stream.aclose()
+        # Finished, not merely asked to stop, by the time the stream is closed
+        assert renders and all(task.cancelled() for task in renders)
+
+    assert run_collecting_loop_errors(client_disconnects()) == []
+
+
+def test_failed_render_aborts_without_orphaned_errors(create_invoice, monkeypatch):
+    for n in range(4):
+        create_invoice(number=f"INV-{n}")
+
+    started = []
+
+    async def broken_pdf(invoice, company):
+        # Every render fails at the same moment, so they finish together
+        started.append(invoice)
+        while len(started) < 4:
+            await asyncio.sleep(0)
+        raise RuntimeError(f"cannot render {invoice['invoice_number']}")
+
+    monkeypatch.setattr(server, "cached_invoice_pdf", broken_pdf)
+    monkeypatch.setattr(server, "PDF_RENDER_WORKERS", 4)
+    # pytest keeps log records, whose args would keep the failed tasks alive
+    monkeypatch.setattr(server.logger, "disabled", True)
+
+    failures = []
+
+    async def archive():
+        stream = server.stream_invoice_pdf_zip({"company_id": server.DEFAULT_COMPANY_ID}, server.DEFAULT_COMPANY_ID)
+        try:
+            async for _ in stream:
+                pass
+        except RuntimeError as e:
+            # Keep only the message: the traceback would keep the tasks alive
+            failures.append(str(e))
+
+    assert run_collecting_loop_errors(archive()) == []
+    assert len(failures) == 1 and failures[0].startswith("cannot render")
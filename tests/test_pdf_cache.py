@@ -0,0 +1,111 @@
+import asyncio
+import os
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import server
+from invoice_pdf import PdfCache
+
+
+def test_put_then_get_round_trips(tmp_path):
+    cache = PdfCache(tmp_path, max_bytes=1024)
+    cache.put("a", b"%PDF-a")
+    assert cache.get("a") == b"%PDF-a"
+    assert cache.get("missing") is None
+
+
+def test_put_is_atomic_and_leaves_no_temp_files(tmp_path):
+    cache = PdfCache(tmp_path, max_bytes=1024)
+    cache.put("a", b"first")
+    cache.put("a", b"second")
+    assert cache.get("a") == b"second"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.pdf"]
+
+
+def test_evicts_least_recently_used_over_budget(tmp_path):
+    cache = PdfCache(tmp_path, max_bytes=250)
+    cache.put("a", b"a" * 100)
+    cache.put("b", b"b" * 100)
+    assert cache.get("a")  # a is now the most recently used
+    cache.put("c", b"c" * 100)
+
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+
+
+def test_keeps_a_single_oversized_entry(tmp_path):
+    cache = PdfCache(tmp_path, max_bytes=10)
+    cache.put("big", b"x" * 100)
+    assert cache.get("big")
+
+
+def test_adopts_files_written_by_another_worker(tmp_path):
+    ours = PdfCache(tmp_path, max_bytes=250, resync_seconds=3600)
+    theirs = PdfCache(tmp_path, max_bytes=250, resync_seconds=3600)
+    theirs.put("shared", b"s" * 100)
+
+    # Not in our index yet, but served from the shared directory
+    assert ours.get("shared") == b"s" * 100
+    # and counted towards our budget once adopted
+    ours.put("ours", b"o" * 100)
+    ours.put("more", b"m" * 100)
+    assert ours._total_bytes <= 250
+    assert len(list(tmp_path.glob("*.pdf"))) == 2
+
+
+def test_resync_bounds_the_directory_across_workers(tmp_path):
+    ours = PdfCache(tmp_path, max_bytes=250, resync_seconds=0)
+    theirs = PdfCache(tmp_path, max_bytes=250, resync_seconds=0)
+    theirs.put("old", b"t" * 100)
+    os.utime(tmp_path / "old.pdf", (1, 1))
+    theirs.put("newer", b"t" * 100)
+    ours.put("newest", b"o" * 100)
+
+    assert sorted(path.name for path in tmp_path.glob("*.pdf")) == ["newer.pdf", "newest.pdf"]
+
+
+class FakePool:
+    """Stands in for ProcessPoolExecutor; the first one created is broken"""
+    created = []
+    shut_down = False
+
+    def __init__(self, *args, **kwargs):
+        self.broken = not FakePool.created
+        FakePool.created.append(self)
+
+    def submit(self, fn, *args):
+        if self.broken:
+            raise BrokenProcessPool("A child process terminated abruptly")
+        future = Future()
+        future.set_result(b"%PDF-rendered")
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_broken_render_pool_is_replaced_and_retried(monkeypatch):
+    FakePool.created = []
+    monkeypatch.setattr(server, "ProcessPoolExecutor", FakePool)
+    monkeypatch.setattr(server, "pdf_executor", None)
+
+    pdf = asyncio.run(server.render_pdf_in_pool({"id": "x"}, {}))
+
+    assert pdf == b"%PDF-rendered"
+    broken, fresh = FakePool.created
+    assert broken.shut_down and not fresh.shut_down
+    assert server.pdf_executor is fresh
+
+
+def test_render_gives_up_when_the_new_pool_breaks_too(monkeypatch):
+    FakePool.created = []
+    monkeypatch.setattr(server, "ProcessPoolExecutor", FakePool)
+    monkeypatch.setattr(server, "pdf_executor", None)
+    monkeypatch.setattr(FakePool, "broken", True, raising=False)
+    monkeypatch.setattr(FakePool, "__init__", lambda self, *args, **kwargs: FakePool.created.append(self))
+
+    with pytest.raises(BrokenProcessPool):
+        asyncio.run(server.render_pdf_in_pool({"id": "x"}, {}))
+    assert len(FakePool.created) == 2 and server.pdf_executor is None
@@ -0,0 +1,48 @@
+import pytest
+from fastapi import HTTPException
+
+from server import invoice_field_path_exists, sparse_projection
+
+
+@pytest.mark.parametrize("path", ["invoice_number", "customer.name", "line_items.amount", "totals.grand_total"])
+def test_known_paths(path):
+    assert invoice_field_path_exists(path)
+
+
+@pytest.mark.parametrize("path", ["nope", "customer.nope", "invoice_number.x", "totals.grand_total.x",
+                                  "schema_version", "customer."])
+def test_unknown_paths(path):
+    assert not invoice_field_path_exists(path)
+
+
+def test_full_documents_need_no_projection():
+    assert sparse_projection(None, "full") is None
+
+
+def test_fields_are_trimmed_and_deduplicated():
+    assert sparse_projection(" invoice_number, customer.name ,invoice_number,", "full") == {
+        "_id": 0, "invoice_number": 1, "customer.name": 1,
+    }
+
+
+def test_summary_view_projects_the_list_page_fields():
+    assert set(sparse_projection(None, "summary")) == {
+        "_id", "id", "invoice_number", "invoice_date", "due_date", "customer.name", "place_of_supply", "totals",
+    }
+
+
+@pytest.mark.parametrize("fields, detail", [
+    ("customer.nope", "Unknown field: customer.nope"),
+    ("totals,totals.grand_total", "Overlapping fields: totals, totals.grand_total"),
+    ("customer.name,customer", "Overlapping fields: customer, customer.name"),
+])
+def test_bad_selections_are_a_400(fields, detail):
+    with pytest.raises(HTTPException) as excinfo:
+        sparse_projection(fields, "full")
+    assert excinfo.value.status_code == 400
+    assert excinfo.value.detail == detail
+
+
+def test_list_endpoint_rejects_unknown_fields(api):
+    response = api.get("/api/invoices", params={"fields": "invoice_number,secret"})
+    assert response.status_code == 400
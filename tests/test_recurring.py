@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import server
+
+
+TEMPLATE = {
+    "name": "Monthly retainer",
+    "customer": {"name": "Acme Pvt Ltd", "address_line1": "1 MG Road", "city": "Bengaluru",
+                 "state": "Karnataka", "zip_code": "560001", "gstin": "29ABCDE1234F1Z5"},
+    "place_of_supply": "Karnataka",
+    "line_items": [{"description": "Retainer", "hsn_sac": "998314", "quantity": 1, "rate": 50000, "amount": 50000}],
+    "service_charges": {"description": "Service charge", "amount": 5000},
+    "day_of_month": 1,
+    "start_date": datetime(2026, 7, 1, tzinfo=timezone.utc),
+}
+
+
+async def create_template(company_id=server.DEFAULT_COMPANY_ID):
+    data = server.RecurringTemplateCreate(**TEMPLATE)
+    template = server.RecurringTemplate(
+        **data.dict(), company_id=company_id,
+        next_run_at=server.first_recurring_run(data.day_of_month, data.start_date),
+    )
+    await server.db.recurring_templates.insert_one(server.template_codec.to_mongo(template.dict()))
+    return template
+
+
+def test_second_run_bills_nothing(mock_db):
+    now = datetime(2026, 10, 15, tzinfo=timezone.utc)
+
+    async def scenario():
+        await server.ensure_indexes()
+        template = await create_template()
+        first = await server.generate_recurring_invoices(now=now)
+        second = await server.generate_recurring_invoices(now=now)
+        invoices = await mock_db.invoices.find({}, {"_id": 0}).sort("invoice_date", 1).to_list(None)
+        stored = await mock_db.recurring_templates.find_one({"id": template.id})
+        counters = await mock_db.counters.find({}).to_list(None)
+        return first, second, invoices, stored, counters
+
+    first, second, invoices, stored, counters = asyncio.run(scenario())
+
+    # July to October, each dated local midnight on the 1st
+    assert first.created == 4 and first.failed == 0
+    assert second.created == 0 and second.templates == 0
+    assert [invoice["recurring_period"] for invoice in invoices] == ["2026-07", "2026-08", "2026-09", "2026-10"]
+    assert stored["last_period"] == "2026-10"
+    # Gap-free: every reserved number was used
+    assert [invoice["invoice_number"] for invoice in invoices] == [
+        f"INV/2026-27/{seq:06d}" for seq in range(1, 5)
+    ]
+    assert counters == [{"_id": "invoice_number:2026-27", "seq": 4}]
+
+
+def test_rerun_after_crash_before_advancing(mock_db):
+    now = datetime(2026, 10, 15, tzinfo=timezone.utc)
+
+    async def scenario():
+        await server.ensure_indexes()
+        template = await create_template()
+        await server.generate_recurring_invoices(now=now)
+        # Simulate a run that inserted invoices but died before advancing the template
+        await mock_db.recurring_templates.update_one(
+            {"id": template.id},
+            {"$set": {"next_run_at": server.to_bson_datetime(template.next_run_at), "last_period": None}}
+        )
+        rerun = await server.generate_recurring_invoices(now=now)
+        return rerun, await mock_db.invoices.count_documents({})
+
+    rerun, count = asyncio.run(scenario())
+
+    assert rerun.created == 0
+    assert rerun.skipped == 4
+    assert count == 4
+
+
+def test_concurrent_run_is_refused_while_lease_is_held(mock_db):
+    async def scenario():
+        await mock_db.leases.insert_one({
+            "_id": server.RECURRING_LEASE_ID, "owner": "another-worker",
+            "expires_at": datetime(2999, 1, 1, tzinfo=timezone.utc),
+        })
+        await create_template()
+        return await server.generate_recurring_invoices(now=datetime(2026, 10, 15, tzinfo=timezone.utc))
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_periods_follow_the_invoicing_time_zone():
+    # Local midnight on the 1st is still the previous day in UTC
+    run_at = server.recurring_run_at(2026, 11, 1)
+    assert run_at == datetime(2026, 10, 31, 18, 30, tzinfo=timezone.utc)
+    assert server.recurring_period(run_at) == "2026-11"
+    assert server.next_recurring_run(run_at, {"cadence": "monthly", "day_of_month": 1}) == \
+        server.recurring_run_at(2026, 12, 1)
+
+
+def test_expired_lease_is_taken_over(mock_db):
+    async def scenario():
+        await mock_db.leases.insert_one({
+            "_id": server.RECURRING_LEASE_ID, "owner": "crashed-worker",
+            "expires_at": datetime.now(timezone.utc) - timedelta(seconds=1),
+        })
+        await create_template()
+        result = await server.generate_recurring_invoices(now=datetime(2026, 10, 15, tzinfo=timezone.utc))
+        return result, await mock_db.leases.find_one({"_id": server.RECURRING_LEASE_ID})
+
+    result, lease = asyncio.run(scenario())
+
+    assert result.created == 4
+    # Ours now, and released (expired) once the run finished
+    assert lease["owner"] == server.job_queue.owner
+    assert lease["expires_at"] <= datetime.now(timezone.utc)
+
+
+def test_run_for_one_company_leaves_the_others_alone(mock_db):
+    async def scenario():
+        await server.ensure_indexes()
+        await create_template()
+        await create_template(company_id="acme")
+        result = await server.generate_recurring_invoices(
+            now=datetime(2026, 10, 15, tzinfo=timezone.utc), company_id="acme"
+        )
+        return result, await mock_db.invoices.distinct("company_id")
+
+    result, companies = asyncio.run(scenario())
+
+    assert result.templates == 1 and result.created == 4
+    assert companies == ["acme"]
@@ -0,0 +1,77 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+
+
+def rebuilt(invoices):
+    """What rebuild_rollups.py would produce for these invoices"""
+    expected = defaultdict(lambda: defaultdict(float))
+    for invoice in invoices:
+        for rollup_id, *_, inc in server.rollup_contributions(invoice, 1):
+            for field, value in inc.items():
+                expected[rollup_id][field] += value
+    return {rollup_id: dict(values) for rollup_id, values in expected.items()}
+
+
+def stored_rollups(mock_db):
+    async def read():
+        invoices = await mock_db.invoices.find({}, {"_id": 0}).to_list(None)
+        rollups = await mock_db.invoice_rollups.find({"invoice_count": {"$gt": 0}}).to_list(None)
+        return invoices, rollups
+    invoices, rollups = asyncio.run(read())
+    fields = ["invoice_count", *server.ROLLUP_FIELDS]
+    return invoices, {rollup["_id"]: {field: rollup[field] for field in fields} for rollup in rollups}
+
+
+def assert_matches_rebuild(mock_db):
+    invoices, rollups = stored_rollups(mock_db)
+    expected = rebuilt(invoices)
+    assert rollups.keys() == expected.keys()
+    for rollup_id, values in expected.items():
+        assert rollups[rollup_id] == pytest.approx(values), rollup_id
+
+
+def test_deltas_track_creates_updates_and_deletes(api, create_invoice, mock_db):
+    first = create_invoice(number="INV-001")
+    second = create_invoice(number="INV-002")
+    create_invoice(number="INV-003", place_of_supply="Kerala")
+    assert_matches_rebuild(mock_db)
+
+    # Moving an invoice to another customer moves its totals with it
+    customer = {**first["customer"], "name": "Globex Ltd"}
+    assert api.put(f"/api/invoices/{first['id']}", json={"customer": customer}).status_code == 200
+    assert_matches_rebuild(mock_db)
+
+    items = [{"description": "Audit", "hsn_sac": "998222", "quantity": 3, "rate": 1500, "amount": 4500}]
+    assert api.put(f"/api/invoices/{second['id']}", json={"line_items": items}).status_code == 200
+    assert_matches_rebuild(mock_db)
+
+    assert api.delete(f"/api/invoices/{second['id']}").status_code == 200
+    assert_matches_rebuild(mock_db)
+
+
+def test_report_reads_the_rollups_per_company(api, create_invoice):
+    create_invoice(number="INV-001")
+    create_invoice(number="INV-002")
+    create_invoice(number="INV-001", company_id="acme")
+
+    ours = api.get("/api/reports/summary", params={"dimension": "customer"}).json()
+    theirs = api.get("/api/reports/summary", params={"dimension": "customer"},
+                     headers={"X-Company-Id": "acme"}).json()
+
+    assert [(row["key"], row["invoice_count"]) for row in ours["rows"]] == [("Acme Pvt Ltd", 2)]
+    assert [(row["key"], row["invoice_count"]) for row in theirs["rows"]] == [("Acme Pvt Ltd", 1)]
+
+
+def test_month_is_the_local_calendar_month():
+    invoice = {
+        "invoice_date": datetime(2026, 10, 31, 20, 0, tzinfo=timezone.utc),  # 1 Nov, 01:30 IST
+        "company_id": "acme", "customer": {"name": "Acme"}, "place_of_supply": "Kerala",
+        "totals": {field: 1.0 for field in server.ROLLUP_FIELDS},
+    }
+    rollup_ids = [rollup_id for rollup_id, *_ in server.rollup_contributions(invoice, 1)]
+    assert rollup_ids == ["acme|2026-11|all|", "acme|2026-11|customer|Acme", "acme|2026-11|place_of_supply|Kerala"]
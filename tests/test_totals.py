@@ -0,0 +1,88 @@
+import asyncio
+import random
+
+import server
+from server import LineItem, ServiceCharge, calculate_totals_and_gst, calculate_totals_batch
+
+
+def random_invoice(rng):
+    line_items = []
+    for _ in range(rng.randint(0, 40)):
+        quantity = rng.randint(1, 50)
+        # Kept below 1000 crore per invoice, where number_to_words stops working
+        rate = round(rng.uniform(0.01, 100000), 2)
+        line_items.append({"description": "Item", "hsn_sac": "9983", "quantity": quantity,
+                           "rate": rate, "amount": round(quantity * rate, 2)})
+    service_charges = {
+        "description": "Service charge",
+        "amount": round(rng.uniform(0, 500000), 2),
+        "cgst_rate": rng.choice([0.0, 2.5, 6.0, 9.0, 14.0, rng.uniform(0, 20)]),
+        "sgst_rate": rng.choice([0.0, 2.5, 6.0, 9.0, 14.0, rng.uniform(0, 20)]),
+    }
+    return {"line_items": line_items, "service_charges": service_charges}
+
+
+def test_batch_matches_scalar_bit_for_bit():
+    rng = random.Random(1234)
+    invoices = [random_invoice(rng) for _ in range(3000)]
+
+    results = calculate_totals_batch(invoices)
+
+    assert len(results) == len(invoices)
+    for invoice, result in zip(invoices, results):
+        service_charges = ServiceCharge(**invoice["service_charges"])
+        expected = calculate_totals_and_gst([LineItem(**item) for item in invoice["line_items"]], service_charges)
+        assert result["totals"] == expected.dict()
+        for field in ("cgst_amount", "sgst_amount", "total_gst"):
+            assert result["service_charges"][field] == getattr(service_charges, field)
+
+
+def test_batch_of_nothing():
+    assert calculate_totals_batch([]) == []
+
+
+def recalculate(**params):
+    return server.recalculate_totals(server.RecalculateParams(**params), server.DEFAULT_COMPANY_ID)
+
+
+def test_recalculate_applies_new_rates(api, create_invoice, mock_db):
+    ids = [create_invoice(number=f"INV-{n}")["id"] for n in range(3)]
+
+    preview = asyncio.run(recalculate(cgst_rate=6, sgst_rate=6, dry_run=True))
+    assert (preview.scanned, preview.changed, preview.updated) == (3, 3, 0)
+    assert api.get(f"/api/invoices/{ids[0]}").json()["service_charges"]["cgst_rate"] == 9
+
+    result = asyncio.run(recalculate(cgst_rate=6, sgst_rate=6, batch_size=2))
+    assert (result.scanned, result.changed, result.updated) == (3, 3, 3)
+    invoice = api.get(f"/api/invoices/{ids[0]}").json()
+    assert invoice["service_charges"]["cgst_rate"] == 6 and invoice["version"] == 1
+    assert invoice["totals"]["total_cgst"] == 30  # 6% of the 500 service charge
+
+    # Nothing drifted, so a second pass writes nothing
+    assert asyncio.run(recalculate(cgst_rate=6, sgst_rate=6)).changed == 0
+
+
+def test_recalculate_keeps_an_edit_made_after_its_read(api, create_invoice, mock_db, monkeypatch):
+    edited, untouched = create_invoice(number="INV-1"), create_invoice(number="INV-2")
+    collection = type(mock_db.invoices)
+    bulk_write = collection.bulk_write
+
+    async def edit_then_bulk_write(self, operations, **kwargs):
+        if self.name == "invoices":
+            # Someone saves a new service charge between the scan and the write
+            api.put(f"/api/invoices/{edited['id']}", json={
+                "service_charges": {"description": "Service charge", "amount": 800}, "version": 0,
+            })
+        return await bulk_write(self, operations, **kwargs)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(collection, "bulk_write", edit_then_bulk_write)
+        result = asyncio.run(recalculate(cgst_rate=6, sgst_rate=6))
+
+    assert (result.changed, result.updated) == (2, 1)
+    kept = api.get(f"/api/invoices/{edited['id']}").json()
+    assert kept["service_charges"]["amount"] == 800 and kept["service_charges"]["cgst_rate"] == 9
+    assert api.get(f"/api/invoices/{untouched['id']}").json()["service_charges"]["cgst_rate"] == 6
+    # Rollups hold the edit and our one write, not our stale view of the edited invoice
+    summary = api.get("/api/reports/summary").json()["rows"][0]
+    assert summary["total_cgst"] == 72 + 30